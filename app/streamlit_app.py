@@ -7,7 +7,9 @@ Run:
 """
 
 import sys
-import uuid
+import html
+import time
+import secrets
 from pathlib import Path
 
 project_root = Path(__file__).resolve().parents[1]
@@ -32,15 +34,22 @@ _css_path = Path(__file__).parent / "style.css"
 with open(_css_path, "r", encoding="utf-8") as _f:
     st.markdown(f"<style>{_f.read()}</style>", unsafe_allow_html=True)
 
+# ─── Shared resources ─────────────────────────────────────────────────────────
+@st.cache_resource
+def get_router() -> Router:
+    # One Router (and compiled query graph) per server process, not per session
+    return Router()
+
+
 # ─── Session state init ───────────────────────────────────────────────────────
 if "router" not in st.session_state:
-    st.session_state.router = Router()
+    st.session_state.router = get_router()
 
 if "history" not in st.session_state:
     st.session_state.history = []
 
 if "session_id" not in st.session_state:
-    st.session_state.session_id = str(uuid.uuid4())[:8]
+    st.session_state.session_id = secrets.token_hex(4)
 
 if "is_processing" not in st.session_state:
     st.session_state.is_processing = False
@@ -54,30 +63,38 @@ with st.sidebar:
     st.markdown("*Pakistan Financial Regulations Intelligence*")
     st.markdown("---")
 
-    st.markdown("**📂 Upload Documents**")
-    uploaded_files = st.file_uploader(
-        "PDF or image files",
-        type=["pdf", "png", "jpg", "jpeg"],
-        accept_multiple_files=True,
-        label_visibility="collapsed",
-        key="file_uploader"
-    )
+    # Fragment: uploading a file or flipping verbose reruns only this panel,
+    # not the whole chat history. Values are read back via their keys.
+    @st.fragment
+    def render_upload_panel():
+        st.markdown("**📂 Upload Documents**")
+        files = st.file_uploader(
+            "PDF or image files",
+            type=["pdf", "png", "jpg", "jpeg"],
+            accept_multiple_files=True,
+            label_visibility="collapsed",
+            key="file_uploader"
+        )
 
-    if uploaded_files:
-        for f in uploaded_files:
-            size_kb = max(1, len(f.getvalue()) // 1024)
-            icon = "📄" if f.name.lower().endswith(".pdf") else "🖼️"
-            st.markdown(f"`{icon} {f.name}` — {size_kb} KB")
+        if files:
+            for f in files:
+                size_kb = max(1, f.size // 1024)
+                icon = "📄" if f.name.lower().endswith(".pdf") else "🖼️"
+                st.markdown(f"`{icon} {f.name}` — {size_kb} KB")
 
-    st.markdown("---")
-    verbose = st.toggle("Verbose mode", value=False)
+        st.markdown("---")
+        st.toggle("Verbose mode", value=False, key="verbose")
+
+    render_upload_panel()
+    uploaded_files = st.session_state.get("file_uploader")
+    verbose = st.session_state.get("verbose", False)
 
     # Clear chat
     if st.session_state.history:
         st.markdown("---")
         if st.button("🗑 Clear chat", use_container_width=True):
             st.session_state.history = []
-            st.session_state.session_id = str(uuid.uuid4())[:8]
+            st.session_state.session_id = secrets.token_hex(4)
             st.rerun()
 
     # History preview
@@ -86,7 +103,8 @@ with st.sidebar:
         st.markdown("**🕐 History**")
         for h in reversed(st.session_state.history[-8:]):
             preview = h["query"][:42] + "..." if len(h["query"]) > 42 else h["query"]
-            st.markdown(f'<div class="history-item">↳ {preview}</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="history-item">↳ {html.escape(preview)}</div>',
+                        unsafe_allow_html=True)
 
     st.markdown("---")
     st.markdown(
@@ -112,56 +130,63 @@ mode_labels = {
     "compare":         "⚖ ↔ 📄 Compare",
 }
 
-for h in st.session_state.history:
-    # User bubble
-    st.markdown(
-        f'<div class="chat-user">'
-        f'<span class="chat-label">You</span>{h["query"]}'
-        f'</div>',
-        unsafe_allow_html=True
-    )
 
-    # Build pills
-    pills_html = ""
-    if h["reg_chunks"]:
-        pills_html += f'<span class="ctx-pill hit">📚 {h["reg_chunks"]} KB chunk(s)</span>'
-    if h["upl_chunks"]:
-        pills_html += f'<span class="ctx-pill hit">📄 {h["upl_chunks"]} doc chunk(s)</span>'
-    if h["web"]:
-        pills_html += f'<span class="ctx-pill web">🌐 {len(h["web"])} web source(s)</span>'
-    if not pills_html:
-        pills_html = '<span class="ctx-pill">⚠ No sources found</span>'
-
-    # Build web sources block
-    web_html = ""
-    if h["web"]:
-        web_html = '<div class="web-sources-block"><div class="web-sources-label">Web Sources</div>'
-        for r in h["web"]:
-            web_html += (
-                f'<div class="web-source">'
-                f'<a href="{r["url"]}" target="_blank">{r["title"]}</a>'
-                f'<br><span style="color:#999;font-size:0.68rem">{r["url"]}</span>'
-                f'</div>'
-            )
-        web_html += '</div>'
-
-    answer_html = h["answer"].replace("\n", "<br>")
-
-    # Assistant bubble
-    st.markdown(f"""
-    <div class="chat-assistant">
-        <span class="chat-label">FinReg Navigator</span>
-        <div class="mode-badge">{mode_labels.get(h["mode"], h["mode"])}</div>
-        <div class="pills-row">{pills_html}</div>
-        <div class="answer-body">{answer_html}</div>
-        {web_html}
-    </div>
-    """, unsafe_allow_html=True)
-
-    if h["steps"]:
-        with st.expander("Execution trace", expanded=False):
-            for s in h["steps"]:
-                st.markdown(f'<div class="step-row">{s}</div>', unsafe_allow_html=True)
+def render_history():
+    for h in st.session_state.history:
+        # User bubble
+        st.markdown(
+            f'<div class="chat-user">'
+            f'<span class="chat-label">You</span>{html.escape(h["query"])}'
+            f'</div>',
+            unsafe_allow_html=True
+        )
+
+        # Build pills
+        pills_html = ""
+        if h["reg_chunks"]:
+            pills_html += f'<span class="ctx-pill hit">📚 {h["reg_chunks"]} KB chunk(s)</span>'
+        if h["upl_chunks"]:
+            pills_html += f'<span class="ctx-pill hit">📄 {h["upl_chunks"]} doc chunk(s)</span>'
+        if h["web"]:
+            pills_html += f'<span class="ctx-pill web">🌐 {len(h["web"])} web source(s)</span>'
+        if not pills_html:
+            pills_html = '<span class="ctx-pill">⚠ No sources found</span>'
+
+        # Build web sources block
+        web_html = ""
+        if h["web"]:
+            web_html = '<div class="web-sources-block"><div class="web-sources-label">Web Sources</div>'
+            for r in h["web"]:
+                web_html += (
+                    f'<div class="web-source">'
+                    f'<a href="{html.escape(r["url"])}" target="_blank">{html.escape(r["title"])}</a>'
+                    f'<br><span style="color:#999;font-size:0.68rem">{html.escape(r["url"])}</span>'
+                    f'</div>'
+                )
+            web_html += '</div>'
+
+        # Same escaping as the streamed answer, so markup in it stays text
+        answer_html = html.escape(h["answer"]).replace("\n", "<br>")
+
+        # Assistant bubble
+        st.markdown(f"""
+        <div class="chat-assistant">
+            <span class="chat-label">FinReg Navigator</span>
+            <div class="mode-badge">{mode_labels.get(h["mode"], h["mode"])}</div>
+            <div class="pills-row">{pills_html}</div>
+            <div class="answer-body">{answer_html}</div>
+            {web_html}
+        </div>
+        """, unsafe_allow_html=True)
+
+        if h["steps"]:
+            with st.expander("Execution trace", expanded=False):
+                for s in h["steps"]:
+                    st.markdown(f'<div class="step-row">{html.escape(s)}</div>',
+                                unsafe_allow_html=True)
+
+
+render_history()
 
 # ─── Processing status placeholder ───────────────────────────────────────────
 status_placeholder = st.empty()
@@ -170,7 +195,7 @@ status_placeholder = st.empty()
 if st.session_state.is_processing and st.session_state.pending_query:
     st.markdown(
         f'<div class="chat-user">'
-        f'<span class="chat-label">You</span>{st.session_state.pending_query}'
+        f'<span class="chat-label">You</span>{html.escape(st.session_state.pending_query)}'
         f'</div>',
         unsafe_allow_html=True
     )
@@ -187,30 +212,32 @@ if st.session_state.is_processing and st.session_state.pending_query:
 # ─── Input bar ────────────────────────────────────────────────────────────────
 st.markdown('<div style="height:1.5rem"></div>', unsafe_allow_html=True)
 
-col_input, col_btn = st.columns([5, 1])
+# Form batches the text area + button so typing never triggers a rerun
+with st.form("ask_form", border=False):
+    col_input, col_btn = st.columns([5, 1])
 
-with col_input:
-    placeholder_text = (
-        "Answering your query..." if st.session_state.is_processing
-        else "Type your question here..."
-    )
-    query = st.text_area(
-        "Query",
-        placeholder=placeholder_text,
-        height=80,
-        label_visibility="collapsed",
-        key="query_input",
-        disabled=st.session_state.is_processing,
-    )
+    with col_input:
+        placeholder_text = (
+            "Answering your query..." if st.session_state.is_processing
+            else "Type your question here..."
+        )
+        query = st.text_area(
+            "Query",
+            placeholder=placeholder_text,
+            height=80,
+            label_visibility="collapsed",
+            key="query_input",
+            disabled=st.session_state.is_processing,
+        )
 
-with col_btn:
-    st.markdown("<div style='height:0.4rem'></div>", unsafe_allow_html=True)
-    btn_label = "⟳ Processing..." if st.session_state.is_processing else "→ Ask"
-    submit = st.button(
-        btn_label,
-        use_container_width=True,
-        disabled=st.session_state.is_processing,
-    )
+    with col_btn:
+        st.markdown("<div style='height:0.4rem'></div>", unsafe_allow_html=True)
+        btn_label = "⟳ Processing..." if st.session_state.is_processing else "→ Ask"
+        submit = st.form_submit_button(
+            btn_label,
+            use_container_width=True,
+            disabled=st.session_state.is_processing,
+        )
 
 # ─── On submit: flip processing flag and rerun to show thinking state ─────────
 if submit and query.strip() and not st.session_state.is_processing:
@@ -224,13 +251,37 @@ if st.session_state.is_processing and st.session_state.pending_query:
 
     files = None
     if uploaded_files:
-        files = [(f.name, f.getvalue()) for f in uploaded_files]
+        # Zero-copy views over the uploads already held in memory
+        files = [(f.name, f.getbuffer()) for f in uploaded_files]
+
+    # Replace the thinking bubble with the answer as tokens arrive, re-rendering
+    # at most every 50 ms rather than once per token
+    streamed = []
+    last_render = [0.0]
+
+    def render_token(token: str):
+        streamed.append(token)
+        now = time.monotonic()
+        if now - last_render[0] < 0.05:
+            return
+        last_render[0] = now
+
+        # Raw model output: escape it before it goes into unsafe HTML
+        partial_html = html.escape("".join(streamed)).replace("\n", "<br>")
+        status_placeholder.markdown(
+            '<div class="chat-assistant">'
+            '<span class="chat-label">FinReg Navigator</span>'
+            f'<div class="answer-body">{partial_html}</div>'
+            '</div>',
+            unsafe_allow_html=True
+        )
 
     try:
         result = st.session_state.router.handle_input(
             query=q,
             files=files,
             upload_id=st.session_state.session_id if files else None,
+            on_token=render_token,
         )
         st.session_state.history.append({
             "query":      q,
@@ -1,18 +1,128 @@
 import logging
-import yaml
-from pathlib import Path
+import orjson
+import re
+from langgraph.config import get_stream_writer
 from src.llm.ollama_client import OllamaClient
+from src.llm.prompt_loader import load_prompts
 
 logger = logging.getLogger(__name__)
 
+# Rough budget for retrieved context; llama3-family tokenizers average ~4 chars/token
+MAX_CONTEXT_TOKENS = 6000
+CHARS_PER_TOKEN    = 4
+
+_FENCE_RE = re.compile(r"```json|```")
+_THINK_RE = re.compile(r"<think>.*?</think>", re.DOTALL)
+
+
+def _token_writer():
+    # Outside a graph run (or without stream_mode="custom") tokens go nowhere
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda _chunk: None
+
+
+def _iter_context_parts(sections):
+    """
+    Yield every labelled block of every non-empty section in one pass,
+    so the whole context body is built by a single join. The first block
+    of a section carries the section heading.
+    """
+    for heading, label, texts in sections:
+        header = f"--- {heading} ---\n"
+        tag    = f"[{label}]\n"
+        for i, text in enumerate(texts):
+            yield f"{header}{tag}{text}" if i == 0 else f"{tag}{text}"
+
 
 class FinalAgent:
 
-    def __init__(self, model="llama3:8b"):
+    def __init__(self, model="llama3:8b", rerank_top_k=None, max_context_tokens=MAX_CONTEXT_TOKENS):
         self.llm = OllamaClient(model=model)
-        project_root = Path(__file__).resolve().parents[2]
-        with open(project_root / "prompts" / "prompts.yaml", "r", encoding="utf-8") as f:
-            self.prompts = yaml.safe_load(f)
+        self.prompts = load_prompts()
+        # Max passages kept for generation. Reranking is a full blocking LLM
+        # call before generation starts, so it is opt-in (None/0 disables it)
+        self.rerank_top_k = rerank_top_k
+        self.max_context_tokens = max_context_tokens
+
+    # ─── Token budget ──────────────────────────────────────────────────────
+    def _apply_token_budget(self, groups: dict) -> dict:
+        """
+        Keep the closest passages (by vector distance; web results, which
+        have none, come last) until the estimated token budget is spent.
+        Kept passages stay in their original order within each group.
+        """
+        flat = [(key, i, block) for key, blocks in groups.items() for i, block in enumerate(blocks)]
+        ranked = sorted(flat, key=lambda item: item[2].get("distance", float("inf")))
+
+        budget_chars = self.max_context_tokens * CHARS_PER_TOKEN
+        used = 0
+        keep = set()
+        for key, i, block in ranked:
+            size = len(block.get("text") or block.get("snippet", ""))
+            if used + size > budget_chars:
+                continue
+            used += size
+            keep.add((key, i))
+
+        if len(keep) < len(flat):
+            logger.info(
+                "[FinalAgent] Token budget kept %d/%d passages (~%d tokens)",
+                len(keep), len(flat), used // CHARS_PER_TOKEN
+            )
+
+        return {
+            key: [block for i, block in enumerate(blocks) if (key, i) in keep]
+            for key, blocks in groups.items()
+        }
+
+    # ─── Single batched rerank call ────────────────────────────────────────
+    def _rerank(self, query: str, groups: dict) -> dict:
+        """
+        Ask the LLM once which of all retrieved passages to keep, instead
+        of sending every chunk into the (much longer) generation prompt.
+        Falls back to the unfiltered groups on any parse problem.
+        """
+        flat = [(key, block) for key, blocks in groups.items() for block in blocks]
+        if not self.rerank_top_k or len(flat) <= self.rerank_top_k:
+            return groups
+
+        # Everything fits the token budget anyway: not worth the extra round-trip
+        total_chars = sum(len(block.get("text") or block.get("snippet", "")) for _, block in flat)
+        if total_chars <= self.max_context_tokens * CHARS_PER_TOKEN:
+            return groups
+
+        numbered = "\n\n".join(
+            f"[{i}] {(block.get('text') or block.get('snippet', ''))[:600]}"
+            for i, (_, block) in enumerate(flat)
+        )
+        response = self.llm.chat([
+            {"role": "system", "content": self.prompts["rerank_prompt"].format(top_k=self.rerank_top_k)},
+            {"role": "user",   "content": f"Query: {query}\n\nPassages:\n{numbered}"},
+        ])
+
+        clean_res = _THINK_RE.sub("", _FENCE_RE.sub("", response)).strip()
+
+        try:
+            keep = orjson.loads(clean_res)["keep"]
+            ids = [i for i in keep if isinstance(i, int) and 0 <= i < len(flat)]
+        except Exception:
+            logger.warning("[FinalAgent] Rerank JSON parsing failed. Keeping all passages.")
+            return groups
+
+        ids = list(dict.fromkeys(ids))[:self.rerank_top_k]
+        if not ids:
+            logger.warning("[FinalAgent] Rerank kept nothing. Keeping all passages.")
+            return groups
+
+        kept = {key: [] for key in groups}
+        for i in sorted(ids):
+            key, block = flat[i]
+            kept[key].append(block)
+
+        logger.info("[FinalAgent] Rerank kept %d/%d passages", len(ids), len(flat))
+        return kept
 
     def run(self, state: dict) -> dict:
         query             = state["query"]
@@ -25,50 +135,39 @@ class FinalAgent:
         web_results       = state.get("web_results",      [])
 
         state.setdefault("progress", [])
+
+        reranked = self._apply_token_budget(self._rerank(query, {
+            "regulatory_text":   regulatory_text,
+            "uploaded_text":     uploaded_text,
+            "regulatory_images": regulatory_images,
+            "uploaded_images":   uploaded_images,
+            "web_results":       web_results,
+        }))
+        regulatory_text   = reranked["regulatory_text"]
+        uploaded_text     = reranked["uploaded_text"]
+        regulatory_images = reranked["regulatory_images"]
+        uploaded_images   = reranked["uploaded_images"]
+        web_results       = reranked["web_results"]
+
         state["progress"].append("🤖 Generating answer...")
 
         logger.info(
-            f"[FinalAgent] mode={mode} | reg_text={len(regulatory_text)} | "
-            f"upl_text={len(uploaded_text)} | web={len(web_results)}"
+            "[FinalAgent] mode=%s | reg_text=%d | upl_text=%d | web=%d",
+            mode, len(regulatory_text), len(uploaded_text), len(web_results)
         )
 
         # ── Only include sections that actually have content ───────────────
-        def fmt_blocks(blocks, label):
-            if not blocks:
-                return ""
-            return "\n\n".join([f"[{label}]\n{b['text']}" for b in blocks])
-
-        def fmt_web(results):
-            if not results:
-                return ""
-            return "\n\n".join([
-                f"[WEB]\nTitle: {r['title']}\nURL: {r['url']}\nSnippet: {r['snippet']}"
-                for r in results
-            ])
-
-        sections = []
-
-        reg_text = fmt_blocks(regulatory_text, "REGULATORY_KB")
-        if reg_text:
-            sections.append(f"--- Regulatory Knowledge Base ---\n{reg_text}")
-
-        upl_text = fmt_blocks(uploaded_text, "UPLOADED_DOC")
-        if upl_text:
-            sections.append(f"--- Uploaded Document ---\n{upl_text}")
-
-        reg_img = fmt_blocks(regulatory_images, "REGULATORY_IMAGE")
-        if reg_img:
-            sections.append(f"--- Regulatory Images ---\n{reg_img}")
-
-        upl_img = fmt_blocks(uploaded_images, "UPLOADED_IMAGE")
-        if upl_img:
-            sections.append(f"--- Uploaded Images ---\n{upl_img}")
-
-        web = fmt_web(web_results)
-        if web:
-            sections.append(f"--- Web Search Results ---\n{web}")
-
-        context_body = "\n\n".join(sections) if sections else "No context available."
+        parts = _iter_context_parts([
+            ("Regulatory Knowledge Base", "REGULATORY_KB",    (b["text"] for b in regulatory_text)),
+            ("Uploaded Document",         "UPLOADED_DOC",     (b["text"] for b in uploaded_text)),
+            ("Regulatory Images",         "REGULATORY_IMAGE", (b["text"] for b in regulatory_images)),
+            ("Uploaded Images",           "UPLOADED_IMAGE",   (b["text"] for b in uploaded_images)),
+            ("Web Search Results",        "WEB", (
+                f"Title: {r['title']}\nURL: {r['url']}\nSnippet: {r['snippet']}"
+                for r in web_results
+            )),
+        ])
+        context_body = "\n\n".join(parts) or "No context available."
 
         context = f"""User Question: {query}
 
@@ -77,12 +176,18 @@ Verbose: {verbose}
 
 {context_body}"""
 
-        logger.info(f"[FinalAgent] Context: {len(context)} chars")
+        logger.info("[FinalAgent] Context: %d chars", len(context))
 
-        response = self.llm.chat([
+        # Stream tokens out through the graph's custom channel as they arrive
+        write_token = _token_writer()
+        pieces = []
+        for piece in self.llm.chat_stream([
             {"role": "system", "content": self.prompts["final_answer_prompt"]},
             {"role": "user",   "content": context},
-        ])
+        ]):
+            pieces.append(piece)
+            write_token(piece)
+        response = "".join(pieces)
 
         state["progress"].append("✅ Answer ready.")
         logger.info("[FinalAgent] Done.")
@@ -1,13 +1,17 @@
-import json
 import logging
 from pathlib import Path
-import yaml
 import re
 
+import orjson
+
 from src.llm.ollama_client import OllamaClient
+from src.llm.prompt_loader import load_prompts
 
 logger = logging.getLogger(__name__)
 
+_FENCE_RE = re.compile(r"```json|```")
+_THINK_RE = re.compile(r"<think>.*?</think>", re.DOTALL)
+
 
 class IntentAgent:
 
@@ -19,12 +23,9 @@ class IntentAgent:
         self.project_root = Path(__file__).resolve().parents[2]
 
         # --------------------------------------------
-        # Load prompts.yaml
+        # Load prompts.yaml (cached per process)
         # --------------------------------------------
-        prompts_path = self.project_root / "prompts" / "prompts.yaml"
-
-        with open(prompts_path, "r", encoding="utf-8") as f:
-            prompts = yaml.safe_load(f)
+        prompts = load_prompts(self.project_root / "prompts" / "prompts.yaml")
 
         self.system_prompt = prompts["intent_classification"]["system_prompt"]
         self.user_prompt_template = prompts["intent_classification"]["user_prompt"]
@@ -41,6 +42,14 @@ class IntentAgent:
     # -------------------------------------------------
     def run(self, state: dict) -> dict:
 
+        # --------------------------------------------
+        # Router may already have classified the query
+        # while the upload was being ingested
+        # --------------------------------------------
+        if state.get("mode"):
+            logger.info("[IntentAgent] Mode already set: %s", state["mode"])
+            return state
+
         query = state.get("query")
         upload_id = state.get("upload_id")
         has_upload = bool(upload_id)
@@ -66,13 +75,12 @@ class IntentAgent:
         # --------------------------------------------
         response = self.llm.chat(messages)
 
-        logger.info(f"[IntentAgent] Raw LLM output: {response}")
+        logger.info("[IntentAgent] Raw LLM output: %s", response)
 
         # --------------------------------------------
         # Clean Markdown + <think> blocks
         # --------------------------------------------
-        clean_res = re.sub(r"```json|```", "", response).strip()
-        clean_res = re.sub(r"<think>.*?</think>", "", clean_res, flags=re.DOTALL).strip()
+        clean_res = _THINK_RE.sub("", _FENCE_RE.sub("", response)).strip()
 
         # --------------------------------------------
         # Default mode
@@ -82,11 +90,17 @@ class IntentAgent:
         # --------------------------------------------
         # Parse JSON safely
         # --------------------------------------------
-        try:
-            result = json.loads(clean_res)
-            mode = result.get("mode", "regulatory_only")
-        except Exception:
-            logger.warning("[IntentAgent] JSON parsing failed. Using default mode.")
+        likely_in_kb = True
+
+        if not clean_res.startswith("{"):
+            logger.warning("[IntentAgent] LLM did not return JSON. Using default mode.")
+        else:
+            try:
+                result = orjson.loads(clean_res)
+                mode = result.get("mode", "regulatory_only")
+                likely_in_kb = result.get("likely_in_kb", True) is not False
+            except Exception:
+                logger.warning("[IntentAgent] JSON parsing failed. Using default mode.")
 
         # --------------------------------------------
         # Enforce allowed modes
@@ -98,16 +112,19 @@ class IntentAgent:
 
         if mode == "web":
             state["need_web"] = True
+            likely_in_kb = False
 
         if mode not in allowed_modes:
             logger.warning(
-                f"[IntentAgent] Invalid mode '{mode}'. Defaulting to regulatory_only."
+                "[IntentAgent] Invalid mode '%s'. Defaulting to regulatory_only.", mode
             )
             mode = "regulatory_only"
 
         state["mode"] = mode
+        # Hint for RetrievalAgent to start web search alongside KB retrieval
+        state["likely_in_kb"] = likely_in_kb
 
-        logger.info(f"[IntentAgent] Final mode selected: {mode}")
+        logger.info("[IntentAgent] Final mode selected: %s", mode)
 
         return state
 
@@ -1,28 +1,121 @@
+import copy
+import hashlib
 import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from src.rag.retriever import Retriever
 
 logger = logging.getLogger(__name__)
 
+SIMHASH_MAX_DISTANCE = 3
+
+# Longer queries (pasted passages) rarely repeat; don't let them evict real hits
+CACHE_MAX_QUERY_CHARS = 512
+
+
+def _simhash64(text: str) -> int:
+    """64-bit SimHash over word trigrams — near-identical texts differ in few bits."""
+    words = text.lower().split()
+    shingles = [" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+
+    digests = b"".join(
+        hashlib.blake2b(shingle.encode(), digest_size=8).digest() for shingle in shingles
+    )
+    # One row of 64 bits (most significant first) per shingle; a bit is set in
+    # the fingerprint when more than half the shingles have it set
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(-1, 64)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+
+def _dedup_near_duplicates(chunks: list) -> list:
+    """Keep the first (best-ranked) of any chunks whose SimHashes are within SIMHASH_MAX_DISTANCE bits."""
+    kept, kept_hashes = [], []
+    for chunk in chunks:
+        h = _simhash64(chunk["text"])
+        if any((h ^ other).bit_count() <= SIMHASH_MAX_DISTANCE for other in kept_hashes):
+            continue
+        kept.append(chunk)
+        kept_hashes.append(h)
+    return kept
+
 
 class RetrievalAgent:
 
+    # Process-wide LRU of (mode, upload_id, normalized query) → search results
+    CACHE_SIZE = 256
+    _cache: "OrderedDict[tuple, dict]" = OrderedDict()
+    _cache_lock = threading.Lock()
+
+    def __init__(self, web_agent=None):
+        # When set, web search starts alongside retrieval for queries the
+        # IntentAgent predicts are not in the KB
+        self.web_agent = web_agent
+        # One pool for the agent's lifetime (the graph builds a single agent)
+        self._web_pool = (
+            ThreadPoolExecutor(max_workers=2, thread_name_prefix="web-prefetch")
+            if web_agent is not None else None
+        )
+
+    @classmethod
+    def invalidate_upload(cls, upload_id: str):
+        """Drop cached results for an upload_id whose collections are being rebuilt."""
+        with cls._cache_lock:
+            for key in [k for k in cls._cache if k[1] == upload_id]:
+                del cls._cache[key]
+
+    def _search(self, query: str, mode: str, upload_id) -> dict:
+        normalized = " ".join(query.lower().split())
+        key = (mode, upload_id, normalized) if len(normalized) <= CACHE_MAX_QUERY_CHARS else None
+
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                logger.info("[RetrievalAgent] Cache hit.")
+                return copy.deepcopy(self._cache[key])
+
+        retriever = Retriever(
+            mode=mode,
+            upload_id=upload_id
+        )
+        results = retriever.search(query)
+
+        # Boilerplate-heavy PDFs often return the same passage several times.
+        # Dedup within each bucket only — compare mode needs both sides.
+        for bucket, chunks in results.items():
+            deduped = _dedup_near_duplicates(chunks)
+            if len(deduped) < len(chunks):
+                logger.info("[RetrievalAgent] %s: dropped %d near-duplicate(s)", bucket, len(chunks) - len(deduped))
+            results[bucket] = deduped
+
+        if key is not None:
+            with self._cache_lock:
+                self._cache[key] = copy.deepcopy(results)
+                if len(self._cache) > self.CACHE_SIZE:
+                    self._cache.popitem(last=False)
+
+        return results
+
     def run(self, state: dict) -> dict:
 
         query = state.get("query")
         mode = state.get("mode", "regulatory_only")
         upload_id = state.get("upload_id")
 
-        logger.info(f"[RetrievalAgent] Mode: {mode} | upload_id: {upload_id}")
+        logger.info("[RetrievalAgent] Mode: %s | upload_id: %s", mode, upload_id)
 
         state.setdefault("progress", [])
         state["progress"].append("🔎 Searching knowledge base...")
 
-        retriever = Retriever(
-            mode=mode,
-            upload_id=upload_id
-        )
+        web_future = None
+        if self.web_agent is not None and not state.get("likely_in_kb", True):
+            logger.info("[RetrievalAgent] Query likely outside KB — starting web search in parallel.")
+            web_future = self._web_pool.submit(self.web_agent.search, query)
 
-        results = retriever.search(query)
+        results = self._search(query, mode, upload_id)
 
         state["uploaded_text"]     = results.get("uploaded_text",    [])
         state["regulatory_text"]   = results.get("regulatory_text",  [])
@@ -31,13 +124,16 @@ class RetrievalAgent:
         state["retrieval_results"] = results
 
         total_hits = sum(len(v) for v in results.values())
-        logger.info(f"[RetrievalAgent] Total chunks retrieved: {total_hits}")
+        logger.info("[RetrievalAgent] Total chunks retrieved: %d", total_hits)
 
         # Log chunk previews so you can see exactly what the LLM receives
-        for i, chunk in enumerate(state["regulatory_text"]):
-            logger.info(f"[RetrievalAgent] reg_chunk[{i}]: {chunk['text'][:120]}")
-        for i, chunk in enumerate(state["uploaded_text"]):
-            logger.info(f"[RetrievalAgent] upl_chunk[{i}]: {chunk['text'][:120]}")
+        if logger.isEnabledFor(logging.DEBUG):
+            previews = (
+                [f"reg_chunk[{i}]: {c['text'][:120]}" for i, c in enumerate(state["regulatory_text"])] +
+                [f"upl_chunk[{i}]: {c['text'][:120]}" for i, c in enumerate(state["uploaded_text"])]
+            )
+            if previews:
+                logger.debug("[RetrievalAgent] Chunk previews:\n%s", "\n".join(previews))
 
         if total_hits == 0:
             state["need_web"] = True
@@ -49,4 +145,24 @@ class RetrievalAgent:
             upl = len(state["uploaded_text"])   + len(state["uploaded_images"])
             state["progress"].append(f"✅ Found {reg} regulatory chunk(s), {upl} uploaded chunk(s).")
 
-        return state
\ No newline at end of file
+        # If the KB answered after all, the already-started search still runs to
+        # completion in the background: one wasted request, its result ignored
+        if web_future is not None and state["need_web"]:
+            self._collect_prefetched_web(state, web_future)
+
+        return state
+
+    def _collect_prefetched_web(self, state: dict, web_future):
+        try:
+            results = web_future.result()
+            state["progress"].append(
+                f"🌐 Web returned {len(results)} result(s)." if results
+                else "🌐 Web search returned no results."
+            )
+        except Exception as e:
+            results = []
+            logger.warning("[RetrievalAgent] Prefetched web search failed: %s", e)
+            state["progress"].append(f"🌐 Web search failed: {e}")
+
+        state["web_results"] = results
+        state["web_prefetched"] = True
\ No newline at end of file
@@ -6,8 +6,9 @@ logger = logging.getLogger(__name__)
 
 class WebAgent:
 
-    def __init__(self, max_results=3):
+    def __init__(self, max_results=3, timeout=10):
         self.max_results = max_results
+        self.timeout = timeout
 
     def run(self, state: dict) -> dict:
         state.setdefault("progress", [])
@@ -19,33 +20,39 @@ class WebAgent:
 
         query = state["query"]
         state["progress"].append("🌐 Searching web as fallback...")
-        logger.info(f"[WebAgent] Searching: '{query[:80]}'")
-
-        results = []
-        seen_urls = set()
+        logger.info("[WebAgent] Searching: '%.80s'", query)
 
         try:
-            with DDGS() as ddgs:
-                for r in ddgs.text(query, max_results=self.max_results):
-                    url = r.get("href")
-                    if not url or url in seen_urls:
-                        continue
-                    seen_urls.add(url)
-                    results.append({
-                        "title":   r.get("title", ""),
-                        "url":     url,
-                        "snippet": r.get("body", "")[:800],
-                    })
-
-            logger.info(f"[WebAgent] Got {len(results)} result(s).")
+            results = self.search(query)
+
+            logger.info("[WebAgent] Got %d result(s).", len(results))
             state["progress"].append(
                 f"🌐 Web returned {len(results)} result(s)." if results
                 else "🌐 Web search returned no results."
             )
 
         except Exception as e:
-            logger.warning(f"[WebAgent] Failed: {e}")
+            results = []
+            logger.warning("[WebAgent] Failed: %s", e)
             state["progress"].append(f"🌐 Web search failed: {e}")
 
         state["web_results"] = results
-        return state
\ No newline at end of file
+        return state
+
+    def search(self, query: str) -> list:
+        """Search the web for query and return results deduped by URL."""
+        results = []
+        seen_urls = set()
+
+        with DDGS(timeout=self.timeout) as ddgs:
+            for r in ddgs.text(query, max_results=self.max_results):
+                url = r.get("href")
+                if not url or url in seen_urls:
+                    continue
+                seen_urls.add(url)
+                results.append({
+                    "title":   r.get("title", ""),
+                    "url":     url,
+                    "snippet": r.get("body", "")[:800],
+                })
+        return results
@@ -4,53 +4,148 @@ Router - FinReg Navigator
 Upload lifecycle:
   uploads/{upload_id}/   ← raw files from Streamlit
   temp/{upload_id}/      ← pipeline intermediates (deleted after query)
-  chromadb/              ← ephemeral uploaded collections (deleted after query)
+  in-memory Chroma       ← ephemeral uploaded collections (deleted after query)
 """
 
-import json
 import logging
+import multiprocessing
+import os
 import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 from logs.logging_config import setup_logging
+from src.agents.intent import IntentAgent
+from src.agents.retrieval_agent import RetrievalAgent
 from src.graph.query_graph import build_query_graph
 from src.ingest.pdf_extractor import PDFExtractor
 from src.ingest.text_cleaner import TextCleaner
 from src.ingest.document_chunker import DocumentChunker
 from src.ingest.image_describer import ImageDescriber
 from src.ingest.embed import Embedder
+from src.llm.ollama_client import OllamaClient
+from src.rag.retriever import Retriever
 
 logger = logging.getLogger(__name__)
 
 PDF_TYPES   = {".pdf"}
 IMAGE_TYPES = {".png", ".jpg", ".jpeg"}
 
+# PDFs whose images are described at once; they share the describer's rate limiter
+DESCRIBE_WORKERS = 4
+
+
+def _process_one_pdf(pdf: Path, dirs: dict, page_workers: int | None = None) -> str | None:
+    """
+    Extract → clean → chunk a single PDF into the session temp dirs and
+    return the extracted JSON path for the describe step (None on failure).
+    Module-level so it can run in a worker process; page_workers caps the
+    extractor's and chunker's own processes (None: their defaults).
+    """
+    logger.info(f"[Router] Processing PDF: {pdf.name}")
+
+    extractor = PDFExtractor(output_dir=str(dirs["extracted"]), page_workers=page_workers)
+    result = extractor.extract(str(pdf), return_data=True)
+
+    if not result.get("success"):
+        logger.error(f"[Router] Extraction failed: {pdf.name}")
+        return None
+
+    # Hand the extracted dict straight to the cleaner instead of re-reading it
+    json_path = result["output_file"]
+    json_data = result["data"]
+
+    cleaned_path = dirs["cleaned"] / f"{pdf.stem}_cleaned.json"
+    TextCleaner().clean_document(json_data, cleaned_path)
+    DocumentChunker(
+        output_dir=str(dirs["text_chunk"]), max_workers=page_workers
+    ).chunk_document(cleaned_path)
+    return json_path
+
+
+def _remove_tree(folder: Path, max_workers: int = 16):
+    """
+    Delete a session folder: unlink all files in parallel (unlink releases
+    the GIL), then remove the emptied directories bottom-up. Anything left
+    behind is handed to shutil.rmtree.
+    """
+    files, dirs = [], [folder]
+    stack = [folder]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(Path(entry.path))
+                    stack.append(entry.path)
+                else:
+                    files.append(entry.path)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(os.unlink, files))
+
+    try:
+        for d in reversed(dirs):
+            d.rmdir()
+    except OSError:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def _make_describer(dirs: dict) -> ImageDescriber:
+    return ImageDescriber(
+        output_dir = str(dirs["image_chunk"]),
+        charts_dir = str(dirs["extracted"] / "charts"),
+        tables_dir = str(dirs["extracted"] / "tables"),
+    )
+
 
 class Router:
 
-    def __init__(self):
+    def __init__(self, warmup: bool = True):
         # Always ensure logging is active — even if caller forgot setup_logging()
         setup_logging()
 
         self.graph        = build_query_graph()
+        self.intent_agent = IntentAgent()
         self.project_root = Path(__file__).resolve().parent.parent.parent
         self.chromadb_dir = self.project_root / "chromadb"
         self.uploads_dir  = self.project_root / "uploads"
         self.uploads_dir.mkdir(parents=True, exist_ok=True)
+        self._chroma_client = None
 
         logger.info("[Router] Initialized. ChromaDB: %s", self.chromadb_dir)
 
+        if warmup:
+            threading.Thread(target=self._warmup, name="router-warmup", daemon=True).start()
+
+    # ─── Warm-up ──────────────────────────────────────────────────────────
+
+    def _warmup(self):
+        """
+        Pay the cold-start costs (Ollama model load, embedding model load,
+        Chroma index read) in the background instead of on the first query.
+        """
+        OllamaClient().warmup()
+        try:
+            Retriever(mode="regulatory_only").search("warmup")
+            logger.info("[Router] Retriever warmed up.")
+        except Exception as e:
+            logger.warning(f"[Router] Retriever warmup failed: {e}")
+
     # ─── Save raw Streamlit bytes ──────────────────────────────────────────
 
     def save_uploaded_files(self, files: list, upload_id: str) -> List[Path]:
         """
-        files = [(filename: str, file_bytes: bytes), ...]
+        files = [(filename: str, payload: bytes-like or binary file object), ...]
+
+        File objects are streamed to disk in 1 MiB pieces, so a large
+        upload never has to be materialized as one bytes object.
 
         Streamlit usage:
             router.save_uploaded_files(
-                [(f.name, f.read()) for f in st.file_uploader(...)],
+                [(f.name, f.getbuffer()) for f in st.file_uploader(...)],
                 upload_id=st.session_state["session_id"]
             )
         """
@@ -58,10 +153,14 @@ class Router:
         dest_dir.mkdir(parents=True, exist_ok=True)
 
         saved = []
-        for filename, file_bytes in files:
+        for filename, payload in files:
             dest = dest_dir / filename
-            dest.write_bytes(file_bytes)
-            logger.info(f"[Router] Saved: {dest.name} ({len(file_bytes)//1024} KB)")
+            if hasattr(payload, "read"):
+                with open(dest, "wb") as out:
+                    shutil.copyfileobj(payload, out, length=1024 * 1024)
+            else:
+                dest.write_bytes(payload)
+            logger.info(f"[Router] Saved: {dest.name} ({dest.stat().st_size//1024} KB)")
             saved.append(dest)
         return saved
 
@@ -80,33 +179,55 @@ class Router:
             d.mkdir(parents=True, exist_ok=True)
         return dirs
 
+    # ─── Upload Chroma client ─────────────────────────────────────────────
+
+    def _get_chroma_client(self):
+        """
+        In-memory client holding the per-upload collections, opened on first
+        use. Uploads are small and short-lived, so they never touch the
+        persistent store on disk.
+        """
+        if self._chroma_client is None:
+            import chromadb as _chroma
+            self._chroma_client = _chroma.EphemeralClient()
+        return self._chroma_client
+
     # ─── Cleanup ──────────────────────────────────────────────────────────
 
     def _cleanup(self, upload_id: str):
         logger.info(f"[Router] Cleaning up session: {upload_id}")
+        RetrievalAgent.invalidate_upload(upload_id)
 
-        for folder in [
-            self.uploads_dir / upload_id,
-            self.project_root / "temp" / upload_id,
-        ]:
-            if folder.exists():
-                shutil.rmtree(folder)
-                logger.info(f"[Router] Deleted: {folder}")
+        folders = [
+            folder for folder in [
+                self.uploads_dir / upload_id,
+                self.project_root / "temp" / upload_id,
+            ]
+            if folder.exists()
+        ]
 
-        try:
-            import chromadb as _chroma
-            client = _chroma.PersistentClient(path=str(self.chromadb_dir))
-            for name in [
-                f"finreg_uploaded_text_{upload_id}",
-                f"finreg_uploaded_image_{upload_id}",
-            ]:
-                try:
-                    client.delete_collection(name)
-                    logger.info(f"[Router] Deleted collection: {name}")
-                except Exception:
-                    pass
-        except Exception as e:
-            logger.warning(f"[Router] ChromaDB cleanup error: {e}")
+        # Collection deletes run here while the folder trees are removed in the
+        # background; the in-memory deletes are cheap, the tree walks are not.
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            removals = {pool.submit(_remove_tree, folder): folder for folder in folders}
+
+            try:
+                client = self._get_chroma_client()
+                for name in [
+                    f"finreg_uploaded_text_{upload_id}",
+                    f"finreg_uploaded_image_{upload_id}",
+                ]:
+                    try:
+                        client.delete_collection(name)
+                        logger.info(f"[Router] Deleted collection: {name}")
+                    except Exception:
+                        pass
+            except Exception as e:
+                logger.warning(f"[Router] ChromaDB cleanup error: {e}")
+
+            for future in as_completed(removals):
+                future.result()
+                logger.info(f"[Router] Deleted: {removals[future]}")
 
     # ─── Ingestion pipeline ───────────────────────────────────────────────
 
@@ -133,51 +254,106 @@ class Router:
 
         dirs = self._make_temp_dirs(upload_id)
 
-        extractor = PDFExtractor(output_dir=str(dirs["extracted"]))
-        cleaner   = TextCleaner()
-        chunker   = DocumentChunker(output_dir=str(dirs["text_chunk"]))
-        describer = ImageDescriber(
-            output_dir = str(dirs["image_chunk"]),
-            charts_dir = str(dirs["extracted"] / "charts"),
-            tables_dir = str(dirs["extracted"] / "tables"),
-        )
-
         # ── PDFs ──────────────────────────────────────────────────────────
-        for pdf in pdfs:
-            logger.info(f"[Router] Processing PDF: {pdf.name}")
-            result = extractor.extract(str(pdf))
-
-            if not result.get("success"):
-                logger.error(f"[Router] Extraction failed: {pdf.name}")
-                continue
-
-            json_path = result["output_file"]
-            with open(json_path) as f:
-                json_data = json.load(f)
-
-            cleaned_path = dirs["cleaned"] / f"{pdf.stem}_cleaned.json"
-            cleaner.clean_document(json_data, cleaned_path)
-            chunker.chunk_document(cleaned_path)
-            describer.describe_document(json_path)
-
-        # ── Standalone images ─────────────────────────────────────────────
-        for img in images:
-            logger.info(f"[Router] Processing image: {img.name}")
-            describer.describe_single_image(str(img))
+        # One worker process per PDF (CPU-bound rendering/OCR); a single PDF
+        # runs inline to skip the process start-up cost. Workers are spawned,
+        # not forked: the app process already runs threads (warm-up, Streamlit)
+        # whose locks a fork would copy mid-use. Images are described here in
+        # the parent through one describer, so all PDFs share its HTTP client,
+        # rate limiter and cache connection.
+        # The lone PDF is prepared before the describer exists, since the
+        # extractor's own page pool still forks.
+        json_path = _process_one_pdf(pdfs[0], dirs) if len(pdfs) == 1 else None
+
+        with _make_describer(dirs) as describer:
+            if json_path:
+                describer.describe_document(json_path)
+            elif len(pdfs) > 1:
+                self._ingest_pdfs(pdfs, dirs, describer)
+
+            # ── Standalone images ─────────────────────────────────────────
+            for img in images:
+                logger.info(f"[Router] Processing image: {img.name}")
+                describer.describe_single_image(str(img))
 
         # ── Embed ─────────────────────────────────────────────────────────
         logger.info(f"[Router] Embedding into uploaded collections ({upload_id})")
+        # Streamlit reuses session_id as upload_id, so old hits would be stale
+        RetrievalAgent.invalidate_upload(upload_id)
         Embedder(
             mode              = "uploaded",
             upload_id         = upload_id,
             text_chunk_dir    = str(dirs["text_chunk"]),
             image_chunk_dir   = str(dirs["image_chunk"]),
             reset_collections = True,
+            client            = self._get_chroma_client(),
         ).run()
 
         logger.info(f"[Router] Ingestion complete for {upload_id}")
         return dirs
 
+    def _ingest_pdfs(self, pdfs: List[Path], dirs: dict, describer: ImageDescriber):
+        """
+        Prepare PDFs in spawned worker processes and describe each one's
+        images in a thread as soon as it is chunked, as ingest_all.main does.
+        """
+        max_workers = min(len(pdfs), os.cpu_count() or 1)
+        # Each PDF worker gets its share of the cores for its own pools
+        page_workers = max(1, (os.cpu_count() or 1) // max_workers)
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool, \
+                ThreadPoolExecutor(max_workers=DESCRIBE_WORKERS) as describe_pool:
+            prepared = {
+                pool.submit(_process_one_pdf, pdf, dirs, page_workers): pdf
+                for pdf in pdfs
+            }
+            described = {}
+            for future in as_completed(prepared):
+                pdf = prepared[future]
+                try:
+                    json_path = future.result()
+                except Exception as e:
+                    logger.error(f"[Router] Failed on {pdf.name}: {e}")
+                    continue
+                if json_path:
+                    described[describe_pool.submit(describer.describe_document, json_path)] = pdf
+
+            for future in as_completed(described):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"[Router] Describe failed on {described[future].name}: {e}")
+
+    # ─── Overlap intent classification with ingestion ─────────────────────
+
+    def _ingest_and_classify(self, query: str, upload_id: str) -> dict:
+        """
+        Intent only needs the query and whether an upload exists, so the
+        LLM call runs in a worker thread while the upload is ingested.
+        The graph's intent node sees the pre-set mode and skips itself.
+        """
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            intent_future = pool.submit(
+                self.intent_agent.run, {"query": query, "upload_id": upload_id}
+            )
+            self._run_ingestion(upload_id)
+            return intent_future.result()
+
+    # ─── Graph execution ──────────────────────────────────────────────────
+
+    def _run_graph(self, state: dict, on_token: Optional[Callable[[str], None]] = None) -> dict:
+        if on_token is None:
+            return self.graph.invoke(state)
+
+        # "custom" carries answer tokens from FinalAgent, "values" the state
+        result = state
+        for stream_mode, chunk in self.graph.stream(state, stream_mode=["custom", "values"]):
+            if stream_mode == "custom":
+                on_token(chunk)
+            else:
+                result = chunk
+        return result
+
     # ─── Main entry point ─────────────────────────────────────────────────
 
     def handle_input(
@@ -185,6 +361,7 @@ class Router:
         query:     Optional[str]         = None,
         files:     Optional[List[tuple]] = None,   # [(filename, bytes), ...]
         upload_id: Optional[str]         = None,
+        on_token:  Optional[Callable[[str], None]] = None,
     ) -> dict:
         """
         Pattern A — files + query (most common from Streamlit):
@@ -198,6 +375,9 @@ class Router:
 
         Pattern C — no files, pure regulatory query:
             router.handle_input(query="What is the EMI license fee?")
+
+        on_token, if given, is called with each answer token as it is
+        generated; the full answer is still returned in the result.
         """
 
         if files and not upload_id:
@@ -209,9 +389,9 @@ class Router:
 
             if query:
                 try:
-                    self._run_ingestion(upload_id)
+                    state = self._ingest_and_classify(query, upload_id)
                     logger.info(f"[Router] Running query | upload_id={upload_id}")
-                    return self.graph.invoke({"query": query, "upload_id": upload_id})
+                    return self._run_graph(state, on_token)
                 finally:
                     self._cleanup(upload_id)
             else:
@@ -225,13 +405,13 @@ class Router:
         if query and upload_id:
             logger.info(f"[Router] Follow-up query | upload_id={upload_id}")
             try:
-                return self.graph.invoke({"query": query, "upload_id": upload_id})
+                return self._run_graph({"query": query, "upload_id": upload_id}, on_token)
             finally:
                 self._cleanup(upload_id)
 
         # ── Pattern C: pure regulatory query ──────────────────────────────
         if query:
             logger.info(f"[Router] Regulatory query: '{query[:80]}'")
-            return self.graph.invoke({"query": query})
+            return self._run_graph({"query": query}, on_token)
 
         return {"message": "No input provided."}
\ No newline at end of file
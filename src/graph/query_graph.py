@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import TypedDict, List, Optional
 from langgraph.graph import StateGraph, END
 
@@ -12,6 +13,8 @@ class GraphState(TypedDict, total=False):
     upload_id:         Optional[str]
     mode:              str
     need_web:          bool
+    likely_in_kb:      bool
+    web_prefetched:    bool
     uploaded_text:     List[dict]
     regulatory_text:   List[dict]
     uploaded_images:   List[dict]
@@ -24,13 +27,18 @@ class GraphState(TypedDict, total=False):
 
 
 def _route_after_retrieval(state: dict) -> str:
-    return "web" if state.get("need_web", False) else "final"
+    # Web results may already be in state if retrieval ran the search speculatively
+    if state.get("need_web", False) and not state.get("web_prefetched", False):
+        return "web"
+    return "final"
 
 
+@lru_cache(maxsize=1)
 def build_query_graph():
+    # Agents hold no per-request state, so one compiled graph serves every Router
     intent_agent    = IntentAgent()
-    retrieval_agent = RetrievalAgent()
     web_agent       = WebAgent()
+    retrieval_agent = RetrievalAgent(web_agent=web_agent)
     final_agent     = FinalAgent()
 
     builder = StateGraph(GraphState)
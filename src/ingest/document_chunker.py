@@ -1,20 +1,145 @@
 """
 Document Chunker for FinReg Navigator
-Uses LangChain's RecursiveCharacterTextSplitter
+Uses an offset-tracking variant of LangChain's RecursiveCharacterTextSplitter
 """
 
-import json
+import hashlib
+import mmap
 import os
+import re
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from datetime import datetime
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+import orjson
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Chunk cache entries kept; least recently used are evicted beyond this
+CHUNK_CACHE_MAX_ENTRIES = 200
+
+# Part of the chunk-cache key; bump when chunk boundaries change
+CHUNK_CACHE_VERSION = 2
+
+
+class FastRecursiveSplitter(RecursiveCharacterTextSplitter):
+    """
+    RecursiveCharacterTextSplitter that works on (start, end) offsets instead
+    of substrings, with the separator patterns compiled once.
+
+    Chunk boundaries are exactly LangChain's: each span is split on the
+    first separator it contains, pieces shorter than chunk_size are merged
+    with the same overlap rules as TextSplitter._merge_splits, and longer
+    pieces recurse into the remaining separators. Pieces are never copied,
+    so offsets come out directly. Lengths are counted in characters, and
+    keep_separator must be True, "start" or "end".
+    """
+
+    def __init__(self, separators, **kwargs):
+        super().__init__(separators=separators, **kwargs)
+        if not self._keep_separator:
+            # Dropped separators would make merged chunks non-contiguous
+            raise ValueError("FastRecursiveSplitter requires keep_separator")
+        # None stands for the empty separator, which splits into characters
+        self._sep_res = [
+            re.compile(sep if self._is_separator_regex else re.escape(sep)) if sep else None
+            for sep in self._separators
+        ]
+
+    def split_spans(self, text):
+        """Return the (start, end) offset of every chunk in text."""
+        spans = []
+        self._split_span(text, 0, len(text), self._sep_res, spans)
+        return spans
+
+    def split_text(self, text):
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def _split_span(self, text, start, end, sep_res, spans):
+        """Mirror of RecursiveCharacterTextSplitter._split_text on text[start:end]."""
+        sep_re = sep_res[-1]
+        rest = []
+        for i, candidate in enumerate(sep_res):
+            if candidate is None:
+                sep_re = None
+                break
+            if candidate.search(text, start, end):
+                sep_re = candidate
+                rest = sep_res[i + 1:]
+                break
+
+        good = []
+        for piece in self._pieces(text, start, end, sep_re):
+            if piece[1] - piece[0] < self._chunk_size:
+                good.append(piece)
+                continue
+            if good:
+                self._merge_spans(text, good, spans)
+                good = []
+            if rest:
+                self._split_span(text, piece[0], piece[1], rest, spans)
+            else:
+                # LangChain keeps an unsplittable piece whole and unstripped
+                spans.append(piece)
+        if good:
+            self._merge_spans(text, good, spans)
+
+    def _pieces(self, text, start, end, sep_re):
+        """Offsets of _split_text_with_regex's output, empty pieces dropped."""
+        if sep_re is None:
+            return [(i, i + 1) for i in range(start, end)]
+        at_end = self._keep_separator == "end"
+        cuts = [m.end() if at_end else m.start() for m in sep_re.finditer(text, start, end)]
+        bounds = [start, *cuts, end]
+        return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+    def _merge_spans(self, text, pieces, spans):
+        """Mirror of TextSplitter._merge_splits for contiguous pieces."""
+        current = deque()
+        total = 0
+        for start, end in pieces:
+            size = end - start
+            if total + size > self._chunk_size and current:
+                self._add_stripped(text, current[0][0], current[-1][1], spans)
+                while total > self._chunk_overlap or (
+                    total + size > self._chunk_size and total > 0
+                ):
+                    first_start, first_end = current.popleft()
+                    total -= first_end - first_start
+            current.append((start, end))
+            total += size
+        if current:
+            self._add_stripped(text, current[0][0], current[-1][1], spans)
+
+    def _add_stripped(self, text, start, end, spans):
+        """Append text[start:end] with whitespace trimmed, as _join_docs does."""
+        if not self._strip_whitespace:
+            spans.append((start, end))
+            return
+        chunk = text[start:end]
+        stripped = chunk.lstrip()
+        if stripped:
+            start += len(chunk) - len(stripped)
+            spans.append((start, start + len(stripped.rstrip())))
+
+
+def _split_with_offsets(splitter, text):
+    """
+    Split text and return (start, end) offsets into it. Only the offsets
+    cross the process boundary; the chunk strings are sliced from the block
+    text when the JSON is built. Module-level so it can run in a worker
+    process.
+    """
+    return splitter.split_spans(text)
+
+
 class DocumentChunker:
     """
-    Chunks cleaned documents using LangChain's RecursiveCharacterTextSplitter
+    Chunks cleaned documents using FastRecursiveSplitter
 
     Features:
     - Recursive splitting (paragraphs → lines → sentences → words)
@@ -23,21 +148,37 @@ class DocumentChunker:
     - Saves chunks as JSON
     """
 
-    def __init__(self, chunk_size=800, chunk_overlap=200, output_dir="chunked/text_chunk"):
+    def __init__(self, chunk_size=800, chunk_overlap=200, output_dir="chunked/text_chunk",
+                 pages_per_block=50, cache_dir=None, cache_max_entries=CHUNK_CACHE_MAX_ENTRIES,
+                 max_workers=None):
         """
         Initialize document chunker
 
         Args:
             chunk_size: Target size of each chunk in characters (default: 1200)
             chunk_overlap: Number of characters to overlap between chunks (default: 200)
+            pages_per_block: Pages split together as one block; blocks of long
+                documents are split in parallel (default: 50)
+            cache_dir: Directory (relative to the project root) for the
+                content-addressed chunk cache; None disables caching, which
+                keeps uploaded documents out of it (default: None)
+            cache_max_entries: Cache entries kept before the least recently
+                used are evicted (default: 200)
+            max_workers: Cap on processes splitting blocks; callers already
+                running one process per PDF pass their per-PDF share, and 1
+                splits inline (default: CPU count)
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.pages_per_block = pages_per_block
+        self.max_workers = max_workers
         self.project_root = Path(__file__).resolve().parents[2]
         self.output_dir = self.project_root / output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir = self.project_root / cache_dir if cache_dir else None
+        self.cache_max_entries = cache_max_entries
 
-        self.splitter = RecursiveCharacterTextSplitter(
+        self.splitter = FastRecursiveSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             separators=["\n\n", "\n", ". ", " "],
@@ -58,17 +199,45 @@ class DocumentChunker:
         if not cleaned_json_path.is_absolute():
             cleaned_json_path = self.project_root / cleaned_json_path
 
-        with open(cleaned_json_path, 'r', encoding='utf-8') as f:
-            cleaned_json = json.load(f)
+        if output_path is not None:
+            output_path = Path(output_path)
+            if not output_path.is_absolute():
+                output_path = self.project_root / output_path
+
+        # Parse straight from the page cache rather than a heap copy of the file.
+        # The same bytes key the chunk cache, together with the split settings.
+        with open(cleaned_json_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                memoryview(mm) as view:
+            cache_path = None
+            if self.cache_dir is not None:
+                digest = hashlib.blake2b(view, digest_size=16)
+                digest.update(
+                    f"{type(self.splitter).__name__}:v{CHUNK_CACHE_VERSION}:{self.chunk_size}:"
+                    f"{self.chunk_overlap}:{self.pages_per_block}".encode()
+                )
+                cache_path = self.cache_dir / f"{digest.hexdigest()}.json"
+
+                if cache_path.exists():
+                    chunked_json = orjson.loads(cache_path.read_bytes())
+                    # Refresh mtime, which orders eviction
+                    os.utime(cache_path)
+                    logger.info(f"Chunk cache hit: {cache_path.name}")
+                    return self._save(chunked_json, cleaned_json_path, output_path)
+
+            cleaned_json = orjson.loads(view)
 
         pdf_name = cleaned_json.get('pdf_name', 'unknown')
         total_pages = cleaned_json.get('total_pages', 0)
 
         # ---------------------------------------------------
-        # STEP 1: BUILD FULL TEXT + CHARACTER MAP
+        # STEP 1: BUILD PAGE BLOCKS + PAGE OFFSETS
         # ---------------------------------------------------
-        full_text = ""
-        char_to_page_map = []
+        page_blocks = []  # (block_text, page_end_offsets, page_numbers)
+        block_parts = []
+        block_len = 0
+        block_ends = []
+        block_page_nums = []
 
         for page in cleaned_json.get('pages', []):
             page_num = page.get('metadata', {}).get('page', '?')
@@ -77,55 +246,72 @@ class DocumentChunker:
             if not page_text.strip():
                 continue
 
-            page_content = page_text + "\n\n"
-            full_text += page_content
-            char_to_page_map.extend([page_num] * len(page_content))
+            block_parts.append(page_text)
+            block_parts.append("\n\n")
+            block_len += len(page_text) + 2
+            block_ends.append(block_len)
+            block_page_nums.append(page_num)
 
-        if not full_text.strip():
+            if len(block_page_nums) == self.pages_per_block:
+                page_blocks.append(("".join(block_parts), block_ends, block_page_nums))
+                block_parts, block_len, block_ends, block_page_nums = [], 0, [], []
+
+        if block_parts:
+            page_blocks.append(("".join(block_parts), block_ends, block_page_nums))
+
+        if not page_blocks:
             raise ValueError("No content found to chunk.")
 
         # ----------------------------------------
-        # STEP 2: SPLIT WHOLE DOCUMENT RECURSIVELY
+        # STEP 2: SPLIT EACH BLOCK RECURSIVELY
         # ----------------------------------------
-        chunks = self.splitter.split_text(full_text)
+        block_texts = [text for text, _, _ in page_blocks]
+
+        split = partial(_split_with_offsets, self.splitter)
+
+        max_workers = min(len(block_texts), self.max_workers or os.cpu_count() or 1)
+        if max_workers > 1:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                block_chunks = list(pool.map(split, block_texts))
+        else:
+            block_chunks = [split(block_texts[0])]
 
         # ----------------------------------------
         # STEP 3: ASSIGN METADATA TO CHUNKS
         # ----------------------------------------
         all_chunks = []
         chunk_counter = 0
-        current_search_start = 0
-
-        for chunk_text in chunks:
-            if len(chunk_text.strip()) < 15:
-                continue
 
-            start_char = full_text.find(chunk_text, current_search_start)
-            if start_char == -1:
-                start_char = full_text.find(chunk_text)
-                if start_char == -1: continue
-
-            end_char = start_char + len(chunk_text)
-            start_page = char_to_page_map[start_char]
-            end_page = char_to_page_map[min(end_char - 1, len(char_to_page_map) - 1)]
-
-            chunk_data = {
-                "id": f"{pdf_name}_{chunk_counter}",
-                "text": chunk_text,
-                "char_count": len(chunk_text),
-                "word_count": len(chunk_text.split()),
-                "metadata": {
-                    "pdf_name": pdf_name,
-                    "start_page": start_page,
-                    "end_page": end_page,
-                    "chunk_index": chunk_counter,
-                    "type": "text"
+        for (full_text, page_ends, page_nums), spans in zip(page_blocks, block_chunks):
+            last_page = len(page_nums) - 1
+
+            for start_char, end_char in spans:
+                # Materialize the chunk only now, as it goes into the output
+                chunk_text = full_text[start_char:end_char]
+
+                if len(chunk_text.strip()) < 15:
+                    continue
+
+                # Page i covers offsets [page_ends[i-1], page_ends[i])
+                start_page = page_nums[min(bisect_right(page_ends, start_char), last_page)]
+                end_page = page_nums[min(bisect_right(page_ends, end_char - 1), last_page)]
+
+                chunk_data = {
+                    "id": f"{pdf_name}_{chunk_counter}",
+                    "text": chunk_text,
+                    "char_count": end_char - start_char,
+                    "word_count": len(chunk_text.split()),
+                    "metadata": {
+                        "pdf_name": pdf_name,
+                        "start_page": start_page,
+                        "end_page": end_page,
+                        "chunk_index": chunk_counter,
+                        "type": "text"
+                    }
                 }
-            }
 
-            all_chunks.append(chunk_data)
-            chunk_counter += 1
-            current_search_start = end_char
+                all_chunks.append(chunk_data)
+                chunk_counter += 1
 
         # ---------------------------------------------------------
         # STEP 4: DEFINE CHUNKED_JSON (This was the missing piece!)
@@ -141,19 +327,58 @@ class DocumentChunker:
             "chunks": all_chunks
         }
 
-        # ----------------------------------------
-        # STEP 5: SAVE FILE
-        # ----------------------------------------
+        if cache_path is not None:
+            # Write the cache entry atomically so a concurrent ingest never reads half a file
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(orjson.dumps(chunked_json))
+            os.replace(tmp_path, cache_path)
+            self._evict_cache()
+
+        return self._save(chunked_json, cleaned_json_path, output_path)
+
+    def _evict_cache(self):
+        """
+        Drop the least recently used cache entries beyond cache_max_entries.
+        Entries another ingest process removed first are skipped.
+        """
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+
+        if len(entries) <= self.cache_max_entries:
+            return
+
+        entries.sort()
+        for _, path in entries[:len(entries) - self.cache_max_entries]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+        logger.info(f"Chunk cache: evicted {len(entries) - self.cache_max_entries} entries")
+
+    def _save(self, chunked_json, cleaned_json_path, output_path):
+        """
+        STEP 5: SAVE FILE — stamps the source and date (fresh on cache hits too)
+        and writes the chunked JSON to output_path or the default location.
+        """
+        chunked_json["source_file"] = str(cleaned_json_path)
+        chunked_json["chunking_date"] = datetime.now().isoformat()
+
         if output_path is None:
-            output_path = self.output_dir / f"{pdf_name}_chunks.json"
+            output_path = self.output_dir / f"{chunked_json['pdf_name']}_chunks.json"
         else:
-            output_path = Path(output_path)
-            if not output_path.is_absolute():
-                output_path = self.project_root / output_path
             output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(chunked_json, f, indent=2, ensure_ascii=False)
+        # Compact UTF-8 bytes: chunk files are read by the embedder, not people
+        output_path.write_bytes(orjson.dumps(chunked_json))
 
         logger.info(f"Chunking Complete! Saved to: {output_path}")
 
@@ -212,8 +437,7 @@ class DocumentChunker:
         Returns:
             dict: Statistics about chunks
         """
-        with open(chunked_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = orjson.loads(Path(chunked_json_path).read_bytes())
 
         chunks = data.get('chunks', [])
 
@@ -5,9 +5,12 @@ Creates TWO vector stores:
     2. finreg_image_store
 """
 
-import json
 import os
+import threading
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
+import orjson
 from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings
@@ -15,6 +18,73 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# all-MiniLM-L6-v2 ships this dynamically quantized export on the HF hub
+INT8_ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+_text_fields = itemgetter("id", "text", "metadata")
+_image_fields = itemgetter("chunk_id", "text")
+
+
+def _image_metadata(chunk):
+    return {
+        "pdf_name": chunk.get("source_pdf"),
+        "page_number": chunk.get("page_number"),
+        "image_path": chunk.get("image_path"),
+        "type": chunk.get("type", "image"),
+        "file_size_kb": chunk.get("file_size_kb")
+    }
+
+
+def load_embedding_model(model_name, fp16=False, quantize=False, compile_model=False):
+    """
+    Load the SentenceTransformer once per process and configuration; Embedder,
+    Retriever and QueryEmbedder instances share the returned model (encode()
+    is stateless). Loads it optionally as the int8 ONNX export
+    (CPU, needs optimum[onnxruntime]), cast to fp16 (CUDA only), and/or
+    with its transformer wrapped in torch.compile (CUDA only).
+    Falls back to the plain fp32 PyTorch model if int8 loading fails.
+    """
+    # lru_cache keys on the call's exact arguments, so normalize them here:
+    # load(name) and load(name, fp16=False) must hit the same entry
+    return _load_embedding_model(model_name, bool(fp16), bool(quantize), bool(compile_model))
+
+
+@lru_cache(maxsize=4)
+def _load_embedding_model(model_name, fp16, quantize, compile_model):
+    if quantize:
+        try:
+            model = SentenceTransformer(
+                model_name,
+                backend="onnx",
+                model_kwargs={"file_name": INT8_ONNX_FILE}
+            )
+            logger.info("Loaded int8 ONNX embedding model.")
+            return model
+        except Exception as e:
+            logger.warning(f"int8 ONNX model unavailable ({e}) — using PyTorch model.")
+
+    model = SentenceTransformer(model_name)
+
+    if fp16:
+        if model.device.type == "cuda":
+            model.half()
+            logger.info("Embedding model cast to fp16.")
+        else:
+            logger.warning("fp16 requested but no CUDA device — keeping fp32.")
+
+    # encode() already runs under torch.inference_mode; compile only pays on GPU
+    if compile_model:
+        if model.device.type == "cuda":
+            import torch
+            model[0].auto_model = torch.compile(model[0].auto_model, dynamic=True)
+            # Trigger compilation here rather than on the first real batch
+            model.encode(["warmup"])
+            logger.info("Embedding model compiled with torch.compile.")
+        else:
+            logger.warning("torch.compile requested but no CUDA device — skipping.")
+
+    return model
+
 
 class Embedder:
 
@@ -26,7 +96,11 @@ class Embedder:
             image_chunk_dir="chunked/image_chunk",
             persist_dir="chromadb",
             embedding_model="sentence-transformers/all-MiniLM-L6-v2",
-            reset_collections=False
+            reset_collections=False,
+            fp16=False,
+            quantize=False,
+            compile_model=False,
+            client=None
     ):
 
         self.project_root = Path(__file__).resolve().parents[2]
@@ -53,11 +127,22 @@ class Embedder:
             raise ValueError("Mode must be 'regulatory' or 'uploaded'")
 
         logger.info("Loading embedding model...")
-        self.embedder = SentenceTransformer(embedding_model)
+        self.embedder = load_embedding_model(
+            embedding_model, fp16=fp16, quantize=quantize, compile_model=compile_model
+        )
         logger.info("Model loaded.")
 
-        logger.info("Initializing ChromaDB...")
-        self.client = chromadb.PersistentClient(path=self.persist_dir)
+        # Reuse the caller's client (e.g. Router's) instead of reopening the store.
+        # Uploaded collections live in the process-wide in-memory client, which
+        # Retriever reads them back from.
+        if client is not None:
+            self.client = client
+        elif mode == "uploaded":
+            logger.info("Initializing in-memory ChromaDB for uploads...")
+            self.client = chromadb.EphemeralClient()
+        else:
+            logger.info("Initializing ChromaDB...")
+            self.client = chromadb.PersistentClient(path=self.persist_dir)
 
         # 🔥 NEW: optional reset (used for uploaded collections)
         if reset_collections:
@@ -78,6 +163,9 @@ class Embedder:
 
         logger.info(f"Text collection: {text_collection_name}")
         logger.info(f"Image collection: {image_collection_name}")
+
+        # add_image_chunks may be called from several describer threads
+        self._lock = threading.Lock()
     # ========================================
     # INTERNAL UTILITY
     # ========================================
@@ -91,6 +179,33 @@ class Embedder:
         logger.info(f"Found {len(files)} files in {directory}")
         return files
 
+    def _embed_and_upsert(self, collection, ids, texts, metadatas, kind):
+        """
+        Encode every chunk in one call and upsert in Chroma-sized batches.
+        Duplicate ids keep the last occurrence, as per-file upserts used to.
+        """
+        latest = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        if len(latest) < len(ids):
+            keep = sorted(latest.values())
+            ids = [ids[i] for i in keep]
+            texts = [texts[i] for i in keep]
+            metadatas = [metadatas[i] for i in keep]
+
+        # encode() already length-sorts internally, so batches pad uniformly
+        logger.info(f"Embedding {len(texts)} {kind} chunks...")
+        embeddings = self.embedder.encode(texts, batch_size=64, show_progress_bar=True)
+
+        batch = self.client.get_max_batch_size()
+        for i in range(0, len(ids), batch):
+            collection.upsert(
+                documents=texts[i:i + batch],
+                embeddings=embeddings[i:i + batch],
+                metadatas=metadatas[i:i + batch],
+                ids=ids[i:i + batch]
+            )
+
+        logger.info(f"Added {len(ids)} {kind} embeddings.")
+
     # ========================================
     # TEXT EMBEDDING
     # ========================================
@@ -99,38 +214,21 @@ class Embedder:
 
         files = self._load_json_files(self.text_chunk_dir)
 
+        chunks = []
+
         for file in files:
             logger.info(f"Processing TEXT file: {file.name}")
 
-            with open(file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            chunks = data.get("chunks", [])
+            data = orjson.loads(file.read_bytes())
+            chunks.extend(data.get("chunks", []))
 
-            ids = []
-            texts = []
-            metadatas = []
+        if not chunks:
+            logger.warning("No text chunks found.")
+            return
 
-            for chunk in chunks:
-                ids.append(chunk["id"])
-                texts.append(chunk["text"])
-                metadatas.append(chunk["metadata"])
+        ids, texts, metadatas = map(list, zip(*map(_text_fields, chunks)))
 
-            if not texts:
-                logger.warning("No text chunks found.")
-                continue
-
-            logger.info(f"Embedding {len(texts)} text chunks...")
-            embeddings = self.embedder.encode(texts, show_progress_bar=True)
-
-            self.text_collection.upsert(
-                documents=texts,
-                embeddings=embeddings,
-                metadatas=metadatas,
-                ids=ids
-            )
-
-            logger.info(f"Added {len(ids)} text embeddings.")
+        self._embed_and_upsert(self.text_collection, ids, texts, metadatas, "text")
 
     # ========================================
     # IMAGE EMBEDDING
@@ -140,45 +238,38 @@ class Embedder:
 
         files = self._load_json_files(self.image_chunk_dir)
 
+        chunks = []
+
         for file in files:
             logger.info(f"Processing IMAGE file: {file.name}")
 
-            with open(file, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = orjson.loads(file.read_bytes())
 
             # Support both formats
-            chunks = data.get("image_chunks", data.get("chunks", []))
-
-            ids = []
-            texts = []
-            metadatas = []
-
-            for chunk in chunks:
-                ids.append(chunk["chunk_id"])
-                texts.append(chunk["text"])
-                metadatas.append({
-                    "pdf_name": chunk.get("source_pdf"),
-                    "page_number": chunk.get("page_number"),
-                    "image_path": chunk.get("image_path"),
-                    "type": chunk.get("type", "image"),
-                    "file_size_kb": chunk.get("file_size_kb")
-                })
-
-            if not texts:
-                logger.warning("No image chunks found.")
-                continue
-
-            logger.info(f"Embedding {len(texts)} image descriptions...")
-            embeddings = self.embedder.encode(texts, show_progress_bar=True)
-
-            self.image_collection.upsert(
-                documents=texts,
-                embeddings=embeddings,
-                metadatas=metadatas,
-                ids=ids
-            )
+            chunks.extend(data.get("image_chunks", data.get("chunks", [])))
+
+        if not chunks:
+            logger.warning("No image chunks found.")
+            return
+
+        ids, texts = map(list, zip(*map(_image_fields, chunks)))
+        metadatas = list(map(_image_metadata, chunks))
+
+        self._embed_and_upsert(self.image_collection, ids, texts, metadatas, "image")
+
+    def add_image_chunks(self, chunks):
+        """
+        Embed image chunks handed over directly by ImageDescriber (its
+        on_chunks callback) instead of re-reading them from disk.
+        """
+        if not chunks:
+            return
+
+        ids, texts = map(list, zip(*map(_image_fields, chunks)))
+        metadatas = list(map(_image_metadata, chunks))
 
-            logger.info(f"Added {len(ids)} image embeddings.")
+        with self._lock:
+            self._embed_and_upsert(self.image_collection, ids, texts, metadatas, "image")
 
     # ========================================
     # RUN BOTH
@@ -4,23 +4,215 @@ Generates text descriptions for charts and tables using OpenAI Vision
 Saves as image chunks ready for embedding
 """
 
-import json
+import asyncio
+import importlib.util
+import io
+import math
 import os
+import random
+import re
+import threading
 import time
 import logging
 import base64
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
 from datetime import datetime
-import yaml
-from PIL import Image
-from openai import OpenAI
-from openai import RateLimitError
+from functools import lru_cache
+from urllib.parse import quote
+import orjson
 import sys
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 from config import OPENAI_VISION_API_KEY_PAID
+from src.ingest.vision_cache import VisionCache
 
 logger = logging.getLogger(__name__)
 
+# PIL, openai, httpx and yaml are imported where first used, so importing this
+# module (e.g. alongside the rest of the ingest pipeline) stays cheap.
+
+# HTTP/2 lets concurrent requests share one connection; httpx needs h2 for it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+MAX_ATTEMPTS = 5
+MAX_COMPLETION_TOKENS = 200
+
+# Below either threshold an image is skipped rather than described
+MIN_IMAGE_SIZE_KB = 5
+MIN_PIXEL_STDDEV = 8
+
+# Charts whose 64-bit difference hashes differ in at most this many bits are
+# treated as the same picture (repeated logos, footers) and described once
+DUPLICATE_MAX_DISTANCE = 5
+
+# Finished chunks handed to describe_document's on_chunks callback at a time
+ON_CHUNKS_BATCH = 32
+
+# Resized JPEGs up to this size are simple enough for the local vision model
+LOCAL_MAX_JPEG_KB = 60
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_CAP_SECONDS = 60.0
+
+
+def _retry_delay(attempt, error):
+    """
+    Seconds to wait before retrying: the server's Retry-After hint when it
+    sends one, otherwise exponential backoff with full jitter.
+    """
+    response = getattr(error, "response", None)
+    if response is not None:
+        headers = response.headers
+        try:
+            if "retry-after-ms" in headers:
+                return min(float(headers["retry-after-ms"]) / 1000, BACKOFF_CAP_SECONDS)
+            if "retry-after" in headers:
+                return min(float(headers["retry-after"]), BACKOFF_CAP_SECONDS)
+        except ValueError:
+            pass  # HTTP-date form — fall back to backoff
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class RateLimiter:
+    """
+    Client-side RPM/TPM token bucket, so requests are spaced to stay under
+    the account's per-minute limits instead of bursting into 429s.
+
+    Both buckets refill continuously at limit/60 per second up to one
+    minute's worth. reserve() books a request and returns how long the
+    caller must wait before sending it; bookings may drive the buckets
+    negative, which queues later callers behind earlier ones. The state is
+    guarded by a threading lock rather than an asyncio one, so a single
+    limiter works across successive asyncio.run() loops and sync callers.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.max_requests = requests_per_minute
+        self.max_tokens = tokens_per_minute
+        self.available_request_capacity = requests_per_minute
+        self.available_token_capacity = tokens_per_minute
+        self._last_update = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, estimated_tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_update
+            self._last_update = now
+
+            self.available_request_capacity = min(
+                self.max_requests,
+                self.available_request_capacity + elapsed * self.max_requests / 60
+            )
+            self.available_token_capacity = min(
+                self.max_tokens,
+                self.available_token_capacity + elapsed * self.max_tokens / 60
+            )
+
+            self.available_request_capacity -= 1
+            self.available_token_capacity -= estimated_tokens
+
+            return max(
+                0.0,
+                -self.available_request_capacity * 60 / self.max_requests,
+                -self.available_token_capacity * 60 / self.max_tokens
+            )
+
+    def acquire_sync(self, estimated_tokens: int):
+        wait = self.reserve(estimated_tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire(self, estimated_tokens: int):
+        wait = self.reserve(estimated_tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def _estimate_tokens(width, height, prompt, max_tokens):
+    """
+    Rough request size for the TPM budget: high-detail image tiles
+    (shortest side scaled to 768, 512px tiles) plus prompt and completion.
+    """
+    scale = min(1.0, 768 / min(width, height))
+    tiles = math.ceil(width * scale / 512) * math.ceil(height * scale / 512)
+    return 85 + 170 * tiles + len(prompt) // 4 + max_tokens
+
+
+@lru_cache(maxsize=1)
+def _retryable_errors():
+    """Transient failures worth retrying (APITimeoutError is an APIConnectionError)."""
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+    return RateLimitError, APIConnectionError, InternalServerError
+
+
+def _http_client(max_connections, async_client=False):
+    """
+    Pooled keep-alive HTTP client for the OpenAI SDK; trust_env=False skips
+    proxy/netrc environment lookups.
+    """
+    import httpx
+    if not HTTP2_AVAILABLE:
+        logger.warning("h2 not installed — Vision requests fall back to HTTP/1.1")
+    client_cls = httpx.AsyncClient if async_client else httpx.Client
+    return client_cls(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(60, connect=5),
+        limits=httpx.Limits(max_connections=max_connections,
+                            max_keepalive_connections=max_connections),
+        trust_env=False
+    )
+
+
+# Extracted image names: charts {pdf}-{page_index}-{n}.png (0-based page),
+# tables {pdf}_page{page_num}_table{n}.png (1-based page)
+_CHART_NAME_RE = re.compile(r"^(.+)-(\d+)-\d+\.png$")
+_TABLE_NAME_RE = re.compile(r"^(.+)_page(\d+)(?:_[^.]*)?\.png$")
+
+
+def _index_images(directory: Path, name_re, page_offset: int = 0) -> dict:
+    """
+    Bucket the images in directory by source PDF name in one scandir pass,
+    parsing each name once. Returns {pdf_name: [(path, page_num), ...]}
+    sorted by path.
+    """
+    index = {}
+    if not directory.is_dir():
+        return index
+
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            m = name_re.match(entry.name)
+            if m and entry.is_file():
+                index.setdefault(m.group(1), []).append(
+                    (Path(entry.path), int(m.group(2)) + page_offset)
+                )
+
+    for files in index.values():
+        files.sort()
+    return index
+
+
+def _index_charts(directory: Path) -> dict:
+    return _index_images(directory, _CHART_NAME_RE, page_offset=1)
+
+
+def _index_tables(directory: Path) -> dict:
+    return _index_images(directory, _TABLE_NAME_RE)
+
+
+def _group_batches(indices: list, jobs: list, batch_size: int) -> list:
+    """Group job indices into (indices, prompt) batches of consecutive same-prompt jobs."""
+    batches = []
+    for i in indices:
+        prompt = jobs[i][1]
+        if batches and batches[-1][1] is prompt and len(batches[-1][0]) < batch_size:
+            batches[-1][0].append(i)
+        else:
+            batches.append(([i], prompt))
+    return batches
+
 
 class ImageDescriber:
     """
@@ -34,10 +226,33 @@ class ImageDescriber:
                  charts_dir=None,
                  tables_dir=None,
                  model="gpt-4o-mini",
-                 delay_seconds=2.0):
+                 requests_per_minute=500,
+                 tokens_per_minute=200_000,
+                 max_concurrency=4,
+                 batch_size=4,
+                 resize_workers=None,
+                 image_base_url=None,
+                 local_model=None,
+                 warm_up=True):
         self.project_root = Path(__file__).resolve().parents[2]
         self.model = model
-        self.delay_seconds = delay_seconds
+        # Up to max_concurrency requests are in flight at once within
+        # describe_document; the limiter spaces them to the account's limits
+        # and is shared by every document this describer handles
+        self.max_concurrency = max_concurrency
+        # Images of the same kind sent together in one multi-image request
+        self.batch_size = max(1, batch_size)
+        # When the folder holding charts_dir and tables_dir is served over
+        # HTTP(S), requests reference {image_base_url}/{path under it}
+        # (e.g. .../charts/x.png) instead of carrying inline base64
+        self.image_base_url = image_base_url.rstrip("/") if image_base_url else None
+        # PIL releases the GIL while decoding/encoding, so resizes run truly in
+        # parallel here instead of queueing on the shared default executor
+        self._resize_pool = ThreadPoolExecutor(
+            max_workers=resize_workers or os.cpu_count(),
+            thread_name_prefix="resize"
+        )
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
 
         # Support absolute paths for temp session dirs
         _out = Path(output_dir)
@@ -48,10 +263,13 @@ class ImageDescriber:
         # temp/{upload_id}/extracted/charts instead of the global extracted/ dir
         self.charts_dir = Path(charts_dir) if charts_dir else self.project_root / "extracted" / "charts"
         self.tables_dir = Path(tables_dir) if tables_dir else self.project_root / "extracted" / "tables"
+        # Common root of both folders; image URLs are built relative to it
+        self._image_root = Path(os.path.commonpath([self.charts_dir, self.tables_dir]))
 
         # Load prompts
         _prompts = Path(prompts_path)
         _prompts = _prompts if _prompts.is_absolute() else self.project_root / _prompts
+        import yaml
         with open(_prompts, 'r', encoding='utf-8') as f:
             prompts = yaml.safe_load(f)
 
@@ -63,74 +281,442 @@ class ImageDescriber:
             "Describe this image in detail. If it contains charts, graphs, or tables, "
             "extract all key values, labels, and trends. Be concise but thorough."
         )
+        # Appended to a prompt when several images share one request
+        self.batch_instruction = prompts['image_description'].get(
+            'batch_instruction',
+            "You are given {count} images. Describe each one separately as above. "
+            "Return a JSON object {{\"descriptions\": [...]}} with exactly {count} "
+            "strings, one per image, in the order the images were given."
+        )
 
-        # OpenAI Client
+        # OpenAI Client over one pooled keep-alive connection set
+        from openai import OpenAI
+        self._http = _http_client(self.max_concurrency)
         self.client = OpenAI(
-            api_key=OPENAI_VISION_API_KEY_PAID
+            api_key=OPENAI_VISION_API_KEY_PAID,
+            http_client=self._http
         )
 
+        # Open the first connection (DNS, TCP, TLS) in the background so the
+        # first image doesn't pay for it; async clients warm up the same way
+        # when opened (see _async_client)
+        self.warm_up = warm_up
+        if warm_up:
+            threading.Thread(target=self._warm_up, daemon=True).start()
+
+        # Optional local vision model for small, simple images (see _route)
+        self.local_client = None
+        if local_model:
+            from src.ingest.ollama_vision_client import OllamaVisionClient
+            self.local_client = OllamaVisionClient(model=local_model)
+
+        # Descriptions of already-seen images, shared across runs
+        self.cache = VisionCache(self.project_root / ".cache" / "vision.sqlite")
+
         logger.info("ImageDescriber initialized (OpenAI Vision)")
         logger.info(f"Model: {self.model}")
         logger.info(f"Output dir: {self.output_dir}")
-        logger.info(f"Delay between requests: {self.delay_seconds}s")
+        logger.info(f"Rate limits: {requests_per_minute} RPM / {tokens_per_minute} TPM")
+        logger.info(f"Max concurrent requests: {self.max_concurrency}")
+        logger.info(f"Images per request: {self.batch_size}")
+
+    def close(self):
+        """Close the pooled HTTP connections, resize pool and description cache."""
+        self._http.close()
+        self._resize_pool.shutdown()
+        self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------------------------------------------------
+    # Resize image (cost + token control), entirely in memory
+    # ---------------------------------------------------------
+    def _resize_image(self, image_path: str) -> tuple[bytes, int, int]:
+        """Return the JPEG bytes sent to the API and their dimensions."""
+        from PIL import Image
+
+        with Image.open(image_path) as img:
+            # JPEG sources decode straight at a reduced scale (no-op for PNG)
+            img.draft("RGB", (1024, 1024))
+            img.thumbnail((1024, 1024), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=85, optimize=True)
+            return buf.getvalue(), img.width, img.height
+
+    # ---------------------------------------------------------
+    # Pre-filter: skip images with nothing worth describing
+    # ---------------------------------------------------------
+    def _should_describe(self, image_path: Path) -> bool:
+        """
+        False for tiny files and near-uniform images (decorative rules,
+        blank chart frames), which would only spend a Vision call.
+        """
+        if image_path.stat().st_size < MIN_IMAGE_SIZE_KB * 1024:
+            return False
+
+        from PIL import Image, ImageStat
+
+        try:
+            with Image.open(image_path) as img:
+                img.draft("L", (64, 64))
+                thumb = img.convert("L").resize((64, 64))
+        except OSError:
+            return True  # let the describe step report it
+
+        return ImageStat.Stat(thumb).stddev[0] >= MIN_PIXEL_STDDEV
+
+    def _image_hash(self, image_path: Path) -> int | None:
+        """
+        64-bit difference hash: one bit per horizontally adjacent pixel pair
+        of a 9x8 grayscale thumbnail. Robust to rescaling and recompression,
+        so repeats of the same graphic land within a few bits of each other.
+        """
+        from PIL import Image
+
+        try:
+            with Image.open(image_path) as img:
+                img.draft("L", (64, 64))
+                pixels = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+        except OSError:
+            return None
+
+        bits = 0
+        for row in range(8):
+            for col in range(8):
+                left = pixels[row * 9 + col]
+                bits = (bits << 1) | (left > pixels[row * 9 + col + 1])
+        return bits
+
+    def _request_image(self, image_path, image: tuple) -> tuple:
+        """
+        Swap the resized bytes for the image's public URL when
+        image_base_url is set; the bytes still key the cache. Images outside
+        the charts/tables root (standalone uploads) stay inline.
+        """
+        if not self.image_base_url:
+            return image
+        try:
+            relative = Path(image_path).relative_to(self._image_root)
+        except ValueError:
+            return image
+        url = f"{self.image_base_url}/{quote(relative.as_posix())}"
+        return url, image[1], image[2]
 
     # ---------------------------------------------------------
-    # Resize image (cost + token control)
+    # Route: local model for small/simple images, API otherwise
     # ---------------------------------------------------------
-    def _resize_image(self, image_path):
-        img = Image.open(image_path)
-        img.thumbnail((1024, 1024))
-        temp_path = image_path + "_resized.jpg"
-        img.save(temp_path, format="JPEG", quality=85)
-        return temp_path
+    def _route(self, image: tuple) -> str:
+        """
+        Model that should describe a resized image. JPEG size tracks visual
+        complexity, so small encodes (icons, legends, simple bars) go to
+        the local model when one is configured.
+        """
+        if self.local_client and len(image[0]) <= LOCAL_MAX_JPEG_KB * 1024:
+            return self.local_client.model
+        return self.model
+
+    # ---------------------------------------------------------
+    # Build the Vision request for one or more images
+    # ---------------------------------------------------------
+    def _build_messages(self, images: list, prompt: str) -> tuple[list, int]:
+        """
+        Return the request messages for one or more images, and their
+        estimated token cost. Each image is (JPEG bytes or URL, width,
+        height). Several images get the batch instruction and are answered
+        as one JSON object.
+        """
+        if len(images) > 1:
+            prompt = f"{prompt}\n{self.batch_instruction.format(count=len(images))}"
+
+        content = [{"type": "text", "text": prompt}]
+        estimated_tokens = len(prompt) // 4
+
+        for source, width, height in images:
+            if isinstance(source, str):
+                url = source
+            else:
+                url = f"data:image/jpeg;base64,{base64.b64encode(source).decode()}"
+            content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": url
+                }
+            })
+            estimated_tokens += _estimate_tokens(width, height, "", MAX_COMPLETION_TOKENS)
+
+        return [{"role": "user", "content": content}], estimated_tokens
 
     # ---------------------------------------------------------
     # Vision API call with retry + backoff
     # ---------------------------------------------------------
     def _call_vision(self, image_path: str, prompt: str) -> str | None:
 
-        resized_path = self._resize_image(image_path)
-
-        with open(resized_path, "rb") as f:
-            b64 = base64.b64encode(f.read()).decode()
-        message_payload = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{b64}"
-                        }
-                    }
-                ]
-            }
-        ]
-        for attempt in range(3):
+        image = self._resize_image(image_path)
+        backend = self._route(image)
+        cache_key = VisionCache.make_key(image[0], prompt, backend)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Vision cache hit: {Path(image_path).name}")
+            return cached
+
+        if backend != self.model:
+            description = self.local_client.describe_image(image_path, prompt)
+            if description:
+                self.cache.put(cache_key, description)
+                return description
+            logger.info(f"Local model failed on {Path(image_path).name} — using {self.model}")
+            cache_key = VisionCache.make_key(image[0], prompt, self.model)
+
+        message_payload, estimated_tokens = self._build_messages(
+            [self._request_image(image_path, image)], prompt
+        )
+
+        for attempt in range(MAX_ATTEMPTS):
+            self.limiter.acquire_sync(estimated_tokens)
             try:
                 response = self.client.chat.completions.create(
                     model=self.model,
                     messages=message_payload,
-                    max_tokens=200,
+                    max_tokens=MAX_COMPLETION_TOKENS,
                     temperature=0.1
                 )
 
-                os.remove(resized_path)
-                return response.choices[0].message.content
-
-            except RateLimitError:
-                wait = 6 * (attempt + 1)
-                logger.warning(f"Rate limit hit. Waiting {wait}s...")
+                description = response.choices[0].message.content
+                if description:
+                    self.cache.put(cache_key, description)
+                return description
+
+            except _retryable_errors() as e:
+                if attempt == MAX_ATTEMPTS - 1:
+                    logger.error(f"Vision API error after {MAX_ATTEMPTS} attempts: {e}")
+                    break
+                wait = _retry_delay(attempt, e)
+                logger.warning(f"{type(e).__name__}. Retrying in {wait:.1f}s...")
                 time.sleep(wait)
 
             except Exception as e:
                 logger.error(f"Vision API error: {e}")
                 break
 
-        os.remove(resized_path)
         return None
 
+    # ---------------------------------------------------------
+    # Async Vision API call (one request for one or more images)
+    # ---------------------------------------------------------
+    async def _call_vision_async(self, aclient, images: list, prompt: str) -> list | None:
+        """
+        Describe loaded images in one request. Returns one description per
+        image, or None if the call failed or a batch answer did not parse
+        into exactly that many descriptions.
+        """
+        message_payload, estimated_tokens = await asyncio.to_thread(
+            self._build_messages, images, prompt
+        )
+
+        request = {
+            "model": self.model,
+            "messages": message_payload,
+            "max_tokens": MAX_COMPLETION_TOKENS * len(images),
+            "temperature": 0.1
+        }
+        if len(images) > 1:
+            request["response_format"] = {"type": "json_object"}
+
+        for attempt in range(MAX_ATTEMPTS):
+            await self.limiter.acquire(estimated_tokens)
+            try:
+                response = await aclient.chat.completions.create(**request)
+                content = response.choices[0].message.content
+                break
+
+            except _retryable_errors() as e:
+                if attempt == MAX_ATTEMPTS - 1:
+                    logger.error(f"Vision API error after {MAX_ATTEMPTS} attempts: {e}")
+                    return None
+                wait = _retry_delay(attempt, e)
+                logger.warning(f"{type(e).__name__}. Retrying in {wait:.1f}s...")
+                await asyncio.sleep(wait)
+
+            except Exception as e:
+                logger.error(f"Vision API error: {e}")
+                return None
+
+        if len(images) == 1:
+            return [content]
+
+        try:
+            descriptions = orjson.loads(content)["descriptions"]
+        except (TypeError, ValueError, KeyError) as e:
+            logger.warning(f"Unparseable batch answer ({e})")
+            return None
+
+        if len(descriptions) != len(images) or not all(
+                isinstance(d, str) and d.strip() for d in descriptions):
+            logger.warning(f"Batch answer has {len(descriptions)} descriptions "
+                           f"for {len(images)} images")
+            return None
+
+        return descriptions
+
+    async def _describe_batch(self, aclient, images: list, prompt: str,
+                              semaphore) -> list:
+        """
+        Describe a batch in one request, falling back to one request per
+        image if the batch answer is unusable.
+        """
+        async with semaphore:
+            descriptions = await self._call_vision_async(aclient, images, prompt)
+            if descriptions is not None:
+                return descriptions
+            if len(images) == 1:
+                return [None]
+
+            logger.info(f"Retrying {len(images)} images one per request")
+            descriptions = []
+            for image in images:
+                single = await self._call_vision_async(aclient, [image], prompt)
+                descriptions.append(single[0] if single else None)
+            return descriptions
+
+    def _warm_up(self):
+        """models.list() is free and leaves a live connection in the pool."""
+        try:
+            self.client.models.list()
+        except Exception as e:
+            logger.debug(f"OpenAI warm-up failed: {e}")
+
+    async def _warm_up_async(self, aclient):
+        try:
+            await aclient.models.list()
+        except Exception as e:
+            logger.debug(f"OpenAI warm-up failed: {e}")
+
+    @asynccontextmanager
+    async def _async_client(self):
+        """
+        AsyncOpenAI over a pooled HTTP client. Async clients are bound to
+        their event loop, so one is opened per asyncio.run and shared by
+        every request (and document) in it. Its first connection is opened
+        while the images are still being loaded.
+        """
+        from openai import AsyncOpenAI
+        aclient = AsyncOpenAI(
+            api_key=OPENAI_VISION_API_KEY_PAID,
+            http_client=_http_client(self.max_concurrency, async_client=True)
+        )
+        async with aclient:
+            warmup = asyncio.create_task(self._warm_up_async(aclient)) if self.warm_up else None
+            try:
+                yield aclient
+            finally:
+                if warmup is not None:
+                    await warmup
+
+    async def _iter_descriptions(self, jobs: list, aclient, semaphore):
+        """
+        Describe every (image_path, prompt) job, yielding (job index,
+        description or None) as each one finishes. Cached descriptions come
+        first; the rest go batch_size images per request (consecutive jobs
+        sharing a prompt), with requests running concurrently under the
+        shared semaphore.
+        """
+        loop = asyncio.get_running_loop()
+        loaded = await asyncio.gather(
+            *(loop.run_in_executor(self._resize_pool, self._resize_image, str(path))
+              for path, _ in jobs),
+            return_exceptions=True
+        )
+
+        keys = [None] * len(jobs)
+        remote = []
+        local = []
+        hits = 0
+
+        for i, ((path, prompt), image) in enumerate(zip(jobs, loaded)):
+            if isinstance(image, BaseException):
+                logger.error(f"Vision job failed for {Path(path).name}: {image}")
+                yield i, None
+                continue
+
+            backend = self._route(image)
+            keys[i] = VisionCache.make_key(image[0], prompt, backend)
+            cached = self.cache.get(keys[i])
+            if cached is not None:
+                hits += 1
+                yield i, cached
+            elif backend == self.model:
+                remote.append(i)
+            else:
+                local.append(i)
+
+        logger.info(f"Vision cache hits: {hits}/{len(jobs)}"
+                    + (f", local: {len(local)}" if local else ""))
+
+        pending = len(remote) + len(local)
+        if not pending:
+            return
+
+        done = asyncio.Queue()
+
+        async def describe_batch(batch, prompt):
+            try:
+                batch_result = await self._describe_batch(
+                    aclient,
+                    [self._request_image(jobs[i][0], loaded[i]) for i in batch],
+                    prompt,
+                    semaphore
+                )
+            except Exception as e:
+                logger.error(f"Vision batch failed: {e}")
+                batch_result = [None] * len(batch)
+
+            for i, description in zip(batch, batch_result):
+                if description:
+                    self.cache.put(keys[i], description)
+                done.put_nowait((i, description))
+
+        async def describe_remote(indices):
+            await asyncio.gather(*(
+                describe_batch(batch, prompt)
+                for batch, prompt in _group_batches(indices, jobs, self.batch_size)
+            ))
+
+        async def describe_local(indices):
+            # One at a time: the local model serves requests serially anyway
+            fallback = []
+            for i in indices:
+                path, prompt = jobs[i]
+                description = await asyncio.to_thread(
+                    self.local_client.describe_image, str(path), prompt
+                )
+                if description:
+                    self.cache.put(keys[i], description)
+                    done.put_nowait((i, description))
+                else:
+                    fallback.append(i)
+
+            # Whatever the local model could not describe goes to the API
+            if fallback:
+                logger.info(f"Falling back to {self.model} for {len(fallback)} images")
+                for i in fallback:
+                    keys[i] = VisionCache.make_key(loaded[i][0], jobs[i][1], self.model)
+                await describe_remote(fallback)
+
+        workers = asyncio.gather(describe_remote(remote), describe_local(local))
+        try:
+            for _ in range(pending):
+                yield await done.get()
+        finally:
+            if not workers.done():
+                workers.cancel()
+            await asyncio.gather(workers, return_exceptions=True)
+
     # ---------------------------------------------------------
     # Describe a standalone uploaded image (no PDF context)
     # ---------------------------------------------------------
@@ -158,22 +744,23 @@ class ImageDescriber:
             return None
 
         file_size_kb = round(image_path.stat().st_size / 1024, 1)
+        described_at = datetime.now().isoformat()
 
         chunk = {
             "chunk_id": f"{label}_standalone_0",
             "type": "standalone_image",
             "text": description,
-            "image_path": str(image_path).replace("\\", "/"),
+            "image_path": image_path.as_posix(),
             "source_pdf": None,
             "page_number": None,
             "file_size_kb": file_size_kb,
-            "described_at": datetime.now().isoformat()
+            "described_at": described_at
         }
 
         output = {
             "pdf_name": label,
             "total_pages": 1,
-            "described_at": datetime.now().isoformat(),
+            "described_at": described_at,
             "total_chunks": 1,
             "charts_described": 0,
             "tables_described": 0,
@@ -182,8 +769,7 @@ class ImageDescriber:
         }
 
         output_path = self.output_dir / f"{label}_image_chunks.json"
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(output, f, indent=2, ensure_ascii=False)
+        output_path.write_bytes(orjson.dumps(output))
 
         logger.info(f"[describe_single_image] Saved → {output_path}")
         return chunk
@@ -193,7 +779,61 @@ class ImageDescriber:
     # ---------------------------------------------------------
     def describe_document(self, extracted_json_path: str,
                           describe_tables: bool = True,
-                          max_images: int = None) -> dict:
+                          max_images: int = None,
+                          chart_index: dict = None,
+                          table_index: dict = None,
+                          on_chunks=None) -> dict:
+        """
+        chart_index / table_index map pdf_name → sorted (image file, page)
+        pairs (see _index_images); describe_multiple builds them once for
+        all documents. Without them the image folders are scanned per
+        document.
+
+        on_chunks, if given, is called (in a worker thread) with lists of up
+        to ON_CHUNKS_BATCH finished chunks while the rest are still being
+        described — e.g. Embedder.add_image_chunks, so embedding overlaps
+        description.
+        """
+
+        async def run():
+            async with self._async_client() as aclient:
+                return await self._describe_document_async(
+                    extracted_json_path, aclient, asyncio.Semaphore(self.max_concurrency),
+                    describe_tables, max_images, chart_index, table_index, on_chunks
+                )
+
+        return asyncio.run(run())
+
+    async def _describe_document_async(self, extracted_json_path, aclient, semaphore,
+                                       describe_tables=True, max_images=None,
+                                       chart_index=None, table_index=None,
+                                       on_chunks=None) -> dict:
+        report = {}
+        pending = []
+
+        async for chunk in self.iter_chunks(extracted_json_path, aclient, semaphore,
+                                            describe_tables, max_images,
+                                            chart_index, table_index, report):
+            if on_chunks is not None:
+                pending.append(chunk)
+                if len(pending) >= ON_CHUNKS_BATCH:
+                    await asyncio.to_thread(on_chunks, pending)
+                    pending = []
+
+        if pending:
+            await asyncio.to_thread(on_chunks, pending)
+
+        return report
+
+    async def iter_chunks(self, extracted_json_path, aclient, semaphore,
+                          describe_tables=True, max_images=None,
+                          chart_index=None, table_index=None, report=None):
+        """
+        Describe one document's charts and tables, yielding each image chunk
+        as soon as its description is ready. Once exhausted, the chunk file
+        is written and, if given, report is filled with the same summary
+        describe_document returns.
+        """
 
         logger.info("=" * 60)
         logger.info("IMAGE DESCRIBER STARTED")
@@ -203,99 +843,124 @@ class ImageDescriber:
         if not extracted_json_path.is_absolute():
             extracted_json_path = self.project_root / extracted_json_path
 
-        with open(extracted_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = orjson.loads(await asyncio.to_thread(extracted_json_path.read_bytes))
 
         pdf_name = data.get('pdf_name', 'unknown')
         total_pages = data.get('total_pages', 0)
 
-        image_chunks = []
-        chunk_counter = 0
-        charts_described = 0
-        tables_described = 0
-        skipped = 0
+        # -------------------- Collect jobs --------------------
+        # (type, disk_file, page_num, prompt) — charts first, then tables
+        jobs = []
 
-        # -------------------- Charts --------------------
-        all_charts = sorted(self.charts_dir.glob(f"{pdf_name}-*.png"))
+        if chart_index is None:
+            chart_index = _index_charts(self.charts_dir)
+        all_charts = chart_index.get(pdf_name, [])
         logger.info(f"Charts found: {len(all_charts)}")
 
-        for idx, disk_file in enumerate(all_charts, start=1):
-
-            if max_images and charts_described >= max_images:
-                break
-
-            remainder = disk_file.stem.replace(f"{pdf_name}-", "")
-            page_index = int(remainder.split("-")[0])
-            page_num = page_index + 1
-
-            logger.info(f"[Chart {idx}/{len(all_charts)}] {disk_file.name}")
-
-            description = self._call_vision(str(disk_file), self.chart_prompt)
-
-            if description is None:
-                skipped += 1
-                continue
-
-            file_size_kb = round(disk_file.stat().st_size / 1024, 1)
-
-            image_chunks.append({
-                "chunk_id": f"{pdf_name}_chart_p{page_num}_{chunk_counter}",
-                "type": "chart",
-                "text": description,
-                "image_path": str(disk_file).replace('\\', '/'),
-                "source_pdf": pdf_name,
-                "page_number": page_num,
-                "file_size_kb": file_size_kb,
-                "described_at": datetime.now().isoformat()
-            })
-
-            chunk_counter += 1
-            charts_described += 1
-
-            time.sleep(self.delay_seconds)
+        for disk_file, page_num in all_charts[:max_images] if max_images else all_charts:
+            jobs.append(("chart", disk_file, page_num, self.chart_prompt))
 
-        # -------------------- Tables --------------------
         if describe_tables:
 
-            all_tables = sorted(self.tables_dir.glob(f"{pdf_name}*.png"))
+            if table_index is None:
+                table_index = _index_tables(self.tables_dir)
+            all_tables = table_index.get(pdf_name, [])
             logger.info(f"Tables found: {len(all_tables)}")
 
-            for idx, disk_file in enumerate(all_tables, start=1):
+            for disk_file, page_num in all_tables:
+                jobs.append(("table", disk_file, page_num, self.table_prompt))
 
-                stem = disk_file.stem
-                page_part = stem.split('_page')[-1]
-                page_num = int(page_part.split('_')[0])
+        # -------------------- Drop trivial images --------------------
+        loop = asyncio.get_running_loop()
+        keep = await asyncio.gather(
+            *(loop.run_in_executor(self._resize_pool, self._should_describe, job[1])
+              for job in jobs)
+        )
+        trivial = len(jobs) - sum(keep)
+        if trivial:
+            logger.info(f"Skipping {trivial} near-blank or tiny images")
+            jobs = [job for job, kept in zip(jobs, keep) if kept]
+
+        # -------------------- Collapse duplicates --------------------
+        # Each group is described once through its first image; every member
+        # still gets its own chunk. Only charts are grouped: a 9x8 hash cannot
+        # tell apart tables that differ only in their figures.
+        async def chart_hash(job):
+            if job[0] != "chart":
+                return None
+            return await loop.run_in_executor(self._resize_pool, self._image_hash, job[1])
+
+        hashes = await asyncio.gather(*(chart_hash(job) for job in jobs))
+        groups = {}
+
+        for i, (job, image_hash) in enumerate(zip(jobs, hashes)):
+            for first, members in groups.items():
+                first_hash = hashes[first]
+                if (image_hash is not None and first_hash is not None
+                        and jobs[first][3] == job[3]
+                        and (image_hash ^ first_hash).bit_count() <= DUPLICATE_MAX_DISTANCE):
+                    members.append(i)
+                    break
+            else:
+                groups[i] = [i]
+
+        unique = list(groups)
+        if len(unique) < len(jobs):
+            logger.info(f"Collapsed {len(jobs)} images into {len(unique)} unique")
+
+        # -------------------- Describe concurrently --------------------
+        # One timestamp for the whole batch, which was described together
+        described_at = datetime.now().isoformat()
+
+        # Chunks arrive in completion order; the job index keeps ids stable
+        image_chunks = [None] * len(jobs)
+        charts_described = 0
+        tables_described = 0
+        skipped = trivial
 
-                logger.info(f"[Table {idx}/{len(all_tables)}] {disk_file.name}")
+        if jobs:
+            logger.info(f"Describing {len(unique)} images "
+                        f"(up to {self.max_concurrency} in flight)...")
 
-                description = self._call_vision(str(disk_file), self.table_prompt)
+            descriptions = self._iter_descriptions(
+                [(jobs[i][1], jobs[i][3]) for i in unique], aclient, semaphore
+            )
+            async for u, description in descriptions:
+                members = groups[unique[u]]
 
                 if description is None:
-                    skipped += 1
+                    skipped += len(members)
                     continue
 
-                file_size_kb = round(disk_file.stat().st_size / 1024, 1)
+                for i in members:
+                    kind, disk_file, page_num, _ = jobs[i]
+                    file_size_kb = round(disk_file.stat().st_size / 1024, 1)
+
+                    chunk = {
+                        "chunk_id": f"{pdf_name}_{kind}_p{page_num}_{i}",
+                        "type": kind,
+                        "text": description,
+                        "image_path": disk_file.as_posix(),
+                        "source_pdf": pdf_name,
+                        "page_number": page_num,
+                        "file_size_kb": file_size_kb,
+                        "described_at": described_at
+                    }
+                    image_chunks[i] = chunk
 
-                image_chunks.append({
-                    "chunk_id": f"{pdf_name}_table_p{page_num}_{chunk_counter}",
-                    "type": "table",
-                    "text": description,
-                    "image_path": str(disk_file).replace('\\', '/'),
-                    "source_pdf": pdf_name,
-                    "page_number": page_num,
-                    "file_size_kb": file_size_kb,
-                    "described_at": datetime.now().isoformat()
-                })
+                    if kind == "chart":
+                        charts_described += 1
+                    else:
+                        tables_described += 1
 
-                chunk_counter += 1
-                tables_described += 1
+                    yield chunk
 
-                time.sleep(self.delay_seconds)
+        image_chunks = [chunk for chunk in image_chunks if chunk is not None]
 
         output = {
             "pdf_name": pdf_name,
             "total_pages": total_pages,
-            "described_at": datetime.now().isoformat(),
+            "described_at": described_at,
             "total_chunks": len(image_chunks),
             "charts_described": charts_described,
             "tables_described": tables_described,
@@ -305,49 +970,65 @@ class ImageDescriber:
 
         output_path = self.output_dir / f"{pdf_name}_image_chunks.json"
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(output, f, indent=2, ensure_ascii=False)
+        # Compact orjson: image chunk files are read by the embedder, not people
+        output_path.write_bytes(orjson.dumps(output))
 
         logger.info(f"Saved to: {output_path}")
 
-        return output
+        if report is not None:
+            report.update(output)
 
     # ---------------------------------------------------------
     # Describe multiple documents
     # ---------------------------------------------------------
     def describe_multiple(self, extracted_json_files: list,
                           describe_tables: bool = True) -> dict:
+        return asyncio.run(self.describe_multiple_async(extracted_json_files, describe_tables))
 
-        results = {}
-
-        for json_file in extracted_json_files:
-
-            json_path = Path(json_file)
-
-            logger.info("=" * 60)
-            logger.info(f"Processing: {json_path.name}")
-            logger.info("=" * 60)
+    async def describe_multiple_async(self, extracted_json_files: list,
+                                      describe_tables: bool = True) -> dict:
+        """
+        Describe all documents concurrently. They share one client, one
+        concurrency semaphore and the describer's rate limiter, so small
+        PDFs don't queue behind large ones while the budget stays global.
+        """
+        # One scan per folder for all documents instead of a glob per document
+        chart_index = _index_charts(self.charts_dir)
+        table_index = _index_tables(self.tables_dir)
+
+        json_paths = [Path(json_file) for json_file in extracted_json_files]
+        logger.info(f"Describing images for {len(json_paths)} documents")
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._async_client() as aclient:
+            outcomes = await asyncio.gather(
+                *(self._describe_document_async(
+                    str(json_path), aclient, semaphore, describe_tables,
+                    chart_index=chart_index, table_index=table_index
+                ) for json_path in json_paths),
+                return_exceptions=True
+            )
 
-            try:
-                result = self.describe_document(
-                    str(json_path),
-                    describe_tables=describe_tables
-                )
+        results = {}
 
-                results[str(json_path)] = {
-                    'success': True,
-                    'total_chunks': result['total_chunks'],
-                    'charts_described': result['charts_described'],
-                    'tables_described': result['tables_described'],
-                    'skipped': result['skipped']
-                }
+        for json_path, result in zip(json_paths, outcomes):
 
-            except Exception as e:
-                logger.exception("Error during image description")
+            if isinstance(result, BaseException):
+                logger.error(f"Error during image description of {json_path.name}",
+                             exc_info=result)
                 results[str(json_path)] = {
                     'success': False,
-                    'error': str(e)
+                    'error': str(result)
                 }
+                continue
+
+            results[str(json_path)] = {
+                'success': True,
+                'total_chunks': result['total_chunks'],
+                'charts_described': result['charts_described'],
+                'tables_described': result['tables_described'],
+                'skipped': result['skipped']
+            }
 
         return results
 
@@ -383,8 +1064,7 @@ if __name__ == "__main__":
     describer = ImageDescriber(
         prompts_path=str(prompts_path),
         output_dir=str(image_chunk_dir),
-        model="gpt-4o-mini",
-        delay_seconds=2.0
+        model="gpt-4o-mini"
     )
 
     results = describer.describe_multiple(
@@ -1,27 +1,55 @@
 """
 Master Ingestion Pipeline - FinReg Navigator
 
-Pipeline:
+Pipeline (steps 1-4 run per PDF, so each PDF moves on as soon as it is ready):
 1. Extract PDFs
 2. Clean extracted JSON
 3. Chunk cleaned text
-4. Describe images
-5. Embed everything into ChromaDB
+4. Describe images, embedding each batch of image chunks as it is ready
+5. Embed text chunks into ChromaDB
 """
 
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 from logs.logging_config import setup_logging
 from src.ingest.pdf_extractor import PDFExtractor
 from src.ingest.text_cleaner import TextCleaner
 from src.ingest.document_chunker import DocumentChunker
-from src.ingest.image_describer import ImageDescriber
 from src.ingest.embed import Embedder
 
 
 logger = logging.getLogger(__name__)
 
+# Documents whose images are described at once; they share one rate limiter
+DESCRIBE_WORKERS = 4
+
+
+def _prepare_pdf(pdf_path: str, extracted_dir: Path, cleaned_dir: Path,
+                 page_workers: int = 1) -> str:
+    """
+    Extract → clean → chunk one PDF and return its extracted JSON path.
+    Module-level so it can run in a worker process.
+    """
+    extractor = PDFExtractor(output_dir=str(extracted_dir), page_workers=page_workers)
+    result = extractor.extract(pdf_path, return_data=True)
+
+    if not result.get("success"):
+        raise RuntimeError(f"Extraction failed: {pdf_path}")
+
+    # Hand the extracted dict straight to the cleaner instead of re-reading it
+    json_path = Path(result["output_file"])
+    cleaned_path = cleaned_dir / f"{json_path.stem}_cleaned.json"
+    TextCleaner().clean_document(result["data"], cleaned_path)
+    # Regulatory documents are stable, so their chunks are worth caching
+    DocumentChunker(
+        cache_dir=".chunk_cache", max_workers=page_workers
+    ).chunk_document(cleaned_path)
+
+    return str(json_path)
+
 
 def main():
 
@@ -44,7 +72,7 @@ def main():
     chroma_dir = project_root / "chromadb"
 
     # ---------------------------------------------------------
-    # 1️⃣ Extract PDFs
+    # 1️⃣-3️⃣ Extract → Clean → Chunk, one worker process per PDF
     # ---------------------------------------------------------
     pdf_files = list(data_dir.glob("*.pdf"))
 
@@ -52,88 +80,76 @@ def main():
         logger.warning(f"No PDF files found in {data_dir}")
         return
 
-    extractor = PDFExtractor(output_dir=str(extracted_dir))
-
-    extraction_results = extractor.extract_multiple(
-        [str(p) for p in pdf_files]
-    )
-
-    successful_extractions = [
-        r for r in extraction_results if r.get("success")
-    ]
-
-    if not successful_extractions:
-        logger.error("No PDFs extracted successfully. Stopping pipeline.")
+    cleaned_dir.mkdir(parents=True, exist_ok=True)
+
+    # Deferred: only step 4 needs the vision stack
+    from src.ingest.image_describer import ImageDescriber
+
+    prepared_count = 0
+    describe_results = {}
+
+    max_workers = min(len(pdf_files), os.cpu_count() or 1)
+    # Cores left over by the per-PDF workers go to per-page processing
+    page_workers = max(1, (os.cpu_count() or 1) // max_workers)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool, \
+            ThreadPoolExecutor(max_workers=DESCRIBE_WORKERS) as describe_pool:
+
+        prepared = {
+            pool.submit(_prepare_pdf, str(pdf), extracted_dir, cleaned_dir, page_workers): pdf
+            for pdf in pdf_files
+        }
+
+        # Created after the workers are forked, so they don't inherit its threads
+        describer = ImageDescriber(
+            prompts_path=str(project_root / "prompts" / "prompts.yaml"),
+            output_dir=str(image_chunk_dir),
+            model="gpt-4o-mini"
+        )
+        embedder = Embedder(
+            mode="regulatory"
+        )
+
+        # ---------------------------------------------------------
+        # 4️⃣ Describe Images — starts per PDF as soon as it is chunked
+        # ---------------------------------------------------------
+        described = {}
+
+        for future in as_completed(prepared):
+            pdf = prepared[future]
+            try:
+                json_path = future.result()
+            except Exception as e:
+                logger.error(f"Error preparing {pdf.name}: {e}")
+                continue
+
+            prepared_count += 1
+            described[describe_pool.submit(
+                describer.describe_document, json_path,
+                on_chunks=embedder.add_image_chunks
+            )] = pdf
+
+        for future in as_completed(described):
+            pdf = described[future]
+            try:
+                describe_results[pdf.name] = future.result()
+            except Exception as e:
+                logger.error(f"Error describing images of {pdf.name}: {e}")
+
+        describer.close()
+
+    if not prepared_count:
+        logger.error("No PDFs processed successfully. Stopping pipeline.")
         return
 
-    # ---------------------------------------------------------
-    # 2️⃣ Clean Extracted JSON
-    # ---------------------------------------------------------
-    extracted_json_files = list(extracted_dir.glob("*_data.json"))
-
-    cleaner = TextCleaner()
-
-    cleaning_results = cleaner.clean_multiple(
-        extracted_json_files,
-        output_dir=cleaned_dir
-    )
-
-    successful_cleaned = [
-        k for k, v in cleaning_results.items() if v.get("success")
-    ]
+    logger.info(f"Prepared {prepared_count}/{len(pdf_files)} PDFs")
 
-    if not successful_cleaned:
-        logger.error("No files cleaned successfully. Stopping pipeline.")
-        return
-
-    # ---------------------------------------------------------
-    # 3️⃣ Chunk Cleaned Text
-    # ---------------------------------------------------------
-    cleaned_json_files = list(cleaned_dir.glob("*_cleaned.json"))
-
-    chunker = DocumentChunker()
-
-    chunk_results = chunker.chunk_multiple(
-        cleaned_json_files
-    )
-
-    successful_chunks = [
-        k for k, v in chunk_results.items() if v.get("success")
-    ]
-
-    if not successful_chunks:
-        logger.error("No files chunked successfully. Stopping pipeline.")
-        return
-
-    # ---------------------------------------------------------
-    # 4️⃣ Describe Images
-    # ---------------------------------------------------------
-    describer = ImageDescriber(
-        prompts_path=str(project_root / "prompts" / "prompts.yaml"),
-        output_dir=str(image_chunk_dir),
-        model="gpt-4o-mini",
-        delay_seconds=2
-    )
-
-    describe_results = describer.describe_multiple(
-        extracted_json_files
-    )
-
-    successful_descriptions = [
-        k for k, v in describe_results.items() if v.get("success")
-    ]
-
-    if not successful_descriptions:
+    if not describe_results:
         logger.warning("No image descriptions generated.")
 
     # ---------------------------------------------------------
-    # 5️⃣ Embed Everything
+    # 5️⃣ Embed Text — image chunks were embedded while being described
     # ---------------------------------------------------------
-    embedder = Embedder(
-        mode="regulatory"
-    )
-
-    embedder.run()
+    embedder.embed_text_chunks()
 
     logger.info("=" * 80)
     logger.info("FULL INGESTION PIPELINE COMPLETE")
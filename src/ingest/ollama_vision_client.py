@@ -13,9 +13,12 @@ class OllamaVisionClient:
     - qwen2.5vl
     """
 
-    def __init__(self, model: str = "llava", temperature: float = 0.1):
+    def __init__(self, model: str = "llava", temperature: float = 0.1,
+                 host: str | None = None, timeout: float = 60):
         self.model = model
         self.temperature = temperature
+        # One client keeps its HTTP connection to the Ollama server alive across calls
+        self.client = ollama.Client(host=host, timeout=timeout)
 
         logger.info(f"Ollama Vision client initialized with model: {self.model}")
 
@@ -31,7 +34,7 @@ class OllamaVisionClient:
             return None
 
         try:
-            response = ollama.chat(
+            response = self.client.chat(
                 model=self.model,
                 messages=[
                     {
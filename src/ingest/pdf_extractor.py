@@ -7,21 +7,98 @@ import pymupdf
 # import pymupdf.layout
 import pymupdf4llm
 from pymupdf4llm.helpers.check_ocr import should_ocr_page
-import json
+import numpy as np
+from PIL import Image
+import hashlib
+import mmap
 import os
+import shutil
+import orjson
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import cache
 from pathlib import Path
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# pymupdf4llm chunk / image entries with no consumer past extraction
+DROPPED_CHUNK_KEYS = ("graphics", "words")
+DROPPED_IMAGE_KEYS = ("digest",)
+
+# Page batches queued per worker process, so the pool stays balanced when some
+# pages (OCR, many tables) are much slower than others
+BATCHES_PER_WORKER = 4
+
+# Pages between progress log lines; per-page detail is logged at DEBUG
+PROGRESS_EVERY = 50
+
+# Table PNGs: level 1 encodes several times faster than the default 6 for
+# slightly larger files, on up to SAVE_WORKERS threads per page
+TABLE_PNG_COMPRESS_LEVEL = 1
+SAVE_WORKERS = 4
+
+
+def _init_page_worker():
+    """
+    Page workers already use every core the pool was given; keep Tesseract
+    from starting its own OpenMP threads on top in each of them.
+    """
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+def _strided_batches(items, page_workers):
+    """
+    Split items into up to page_workers * BATCHES_PER_WORKER strided batches,
+    so runs of slow pages (OCR, many tables) are spread over every worker.
+    """
+    n_batches = min(len(items), page_workers * BATCHES_PER_WORKER)
+    return [items[k::n_batches] for k in range(n_batches)]
+
+
+# Per worker process: the Document its page batches read from
+_worker_doc = None
+
+
+def _open_in_worker(pdf_path):
+    """
+    PyMuPDF objects can't be pickled or shared between processes, so each
+    worker opens the PDF itself — once, for every batch of both page passes,
+    rather than once per batch. The file's bytes come from the OS page cache
+    the parent's hashing and parsing already filled.
+    """
+    global _worker_doc
+    if _worker_doc is None or _worker_doc.name != pdf_path:
+        if _worker_doc is not None:
+            _worker_doc.close()
+        _worker_doc = pymupdf.open(pdf_path)
+    return _worker_doc
+
+
+def _detect_scanned_pages(extractor, pdf_path, batch):
+    """Worker process entry point: OCR decision for a batch of page indices."""
+    doc = _open_in_worker(pdf_path)
+    return [extractor._should_ocr(doc[i])[0] for i in batch]
+
+
+def _process_pages(extractor, pdf_path, pdf_name, batch):
+    """
+    Worker process entry point: process a batch of (page_index, chunk,
+    needs_ocr) triples.
+    """
+    doc = _open_in_worker(pdf_path)
+    return [
+        extractor._process_page(doc[i], chunk, needs_ocr, pdf_name)
+        for i, chunk, needs_ocr in batch
+    ]
+
 
 class PDFExtractor:
     """
     Complete PDF extraction with image filtering, table extraction, and OCR.
 
     Features:
-    - Text extraction with pymupdf4llm (layout mode)
+    - Text extraction with pymupdf4llm (layout mode), optionally pypdfium2 for plain-text pages
     - Automatic image extraction and filtering
     - Table detection and image extraction
     - OCR for scanned pages using LLaVA
@@ -32,21 +109,24 @@ class PDFExtractor:
     def __init__(self,
                  output_dir="extracted",
                  min_image_area=50000,
-                 min_file_size_kb=10,
+                 min_pixel_variance=50,
                  min_aspect_ratio=0.3,
                  max_aspect_ratio=3.0,
                  table_dpi=200,
                  table_padding=10,
                  ocr_dpi=200,
                  image_size_limit=0.05,
-                 table_strategy="lines_strict"):
+                 table_strategy="lines_strict",
+                 page_workers=None,
+                 text_backend="pymupdf4llm"):
         """
         Initialize PDF extractor with customizable settings.
 
         Args:
             output_dir: Base directory for all outputs (default: "extracted")
             min_image_area: Minimum image area in pixels² (default: 50000)
-            min_file_size_kb: Minimum image file size in KB (default: 10)
+            min_pixel_variance: Reject images whose sample variance is below
+                this (blank, flat-tinted or faint-noise regions) (default: 50)
             min_aspect_ratio: Minimum width/height ratio (default: 0.3)
             max_aspect_ratio: Maximum width/height ratio (default: 3.0)
             table_dpi: DPI for table image extraction (default: 200)
@@ -54,6 +134,15 @@ class PDFExtractor:
             ocr_dpi: DPI for OCR image extraction (default: 200)
             image_size_limit: Image size as fraction of page (default: 0.05)
             table_strategy: Table detection method (default: "lines_strict")
+            page_workers: Processes for per-page OCR, image filtering and
+                table extraction; 1 processes pages inline
+                (default: min(CPU count, 4))
+            text_backend: "pymupdf4llm" sends every page through
+                pymupdf4llm; "pypdfium2" reads plain-text pages (no images
+                or vector drawings) with pypdfium2 instead. Faster, but those
+                pages come out as raw text: no markdown headings or bold and
+                no blank-line paragraph breaks, so they chunk differently
+                (default: "pymupdf4llm")
         """
 
         # Output directories — support both absolute and relative paths
@@ -62,11 +151,16 @@ class PDFExtractor:
         self.output_dir = output_dir if output_dir.is_absolute() else self.project_root / output_dir
         self.charts_dir = self.output_dir / "charts"
         self.tables_dir = self.output_dir / "tables"
+        # str once, for the per-image path f-strings
+        self._charts_root = os.fspath(self.charts_dir)
+        self._tables_root = os.fspath(self.tables_dir)
+        # Extraction results keyed by PDF bytes + settings (see _cache_key)
+        self.cache_dir = self.output_dir / "cache"
 
 
         # Image filter settings
         self.min_image_area = min_image_area
-        self.min_file_size_kb = min_file_size_kb
+        self.min_pixel_variance = min_pixel_variance
         self.min_aspect_ratio = min_aspect_ratio
         self.max_aspect_ratio = max_aspect_ratio
 
@@ -81,6 +175,12 @@ class PDFExtractor:
         self.image_size_limit = image_size_limit
         self.table_strategy = table_strategy
 
+        # Text extraction backend for pages without images or drawings
+        self.text_backend = text_backend
+
+        # Page processing
+        self.page_workers = page_workers or min(os.cpu_count() or 1, 4)
+
         # Create directories
         self._setup_directories()
 
@@ -89,102 +189,138 @@ class PDFExtractor:
         os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(self.charts_dir, exist_ok=True)
         os.makedirs(self.tables_dir, exist_ok=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
 
     def _get_pdf_name(self, pdf_path):
         """Extract PDF filename without extension."""
         return Path(pdf_path).stem
 
-    def _filter_image(self, image_bbox, page):
+    def _pixel_rect(self, page_pix, bbox):
+        """bbox (page coordinates) as a pixel IRect of the page render, clipped to it."""
+        zoom = self.table_dpi / 72
+        return (pymupdf.Rect(bbox) * pymupdf.Matrix(zoom, zoom)).irect & page_pix.irect
+
+    def _crop(self, page_pix, bbox):
         """
-        Check if image should be kept based on custom filters.
+        Copy the bbox region (page coordinates) out of the page render.
 
         Args:
-            image_bbox: Tuple (x0, y0, x1, y1) - image location
-            page: PyMuPDF page object
+            page_pix: Full-page pixmap rendered at table_dpi
+            bbox: Rect (or tuple) in page coordinates
 
         Returns:
-            Tuple (should_keep: bool, reason: str)
+            pymupdf.Pixmap of just that region
         """
-        # Calculate dimensions
-        x0, y0, x1, y1 = image_bbox
-        width = x1 - x0
-        height = y1 - y0
-        area = width * height
-
-        # Filter 1: Area check
-        if area < self.min_image_area:
-            return False, "too small area", None
-
-        # Filter 2: File size check
-        bbox_rect = pymupdf.Rect(image_bbox)
-        pix = page.get_pixmap(clip=bbox_rect, dpi=150)
-        file_size_kb = len(pix.tobytes("png")) / 1024
+        irect = self._pixel_rect(page_pix, bbox)
+        crop = pymupdf.Pixmap(page_pix.colorspace, irect, page_pix.alpha)
+        crop.copy(page_pix, irect)
+        return crop
 
-        if file_size_kb < self.min_file_size_kb:
-            return False, "file too small (blank/low quality)", file_size_kb
-
-        # Filter 3: Aspect ratio check
-        aspect_ratio = width / height if height > 0 else 0
+    def _pixel_variance(self, image_bbox, page_pix):
+        """
+        Variance of the image region's samples, read through a view of the
+        page render's buffer — no PNG encode and no crop copy. Line charts on
+        white score in the hundreds; blank or faintly noisy regions stay
+        well under min_pixel_variance.
 
-        if aspect_ratio < self.min_aspect_ratio or aspect_ratio > self.max_aspect_ratio:
-            return False, f"bad aspect ratio ({aspect_ratio:.2f})", file_size_kb
+        Args:
+            image_bbox: Tuple (x0, y0, x1, y1) - image location
+            page_pix: Full-page pixmap rendered at table_dpi
 
-        # Passed all filters
-        return True, "passed", file_size_kb
+        Returns:
+            float: Variance over all channels (0 for a single flat color)
+        """
+        irect = self._pixel_rect(page_pix, image_bbox)
+        if irect.is_empty:
+            return 0.0
+        samples = np.frombuffer(page_pix.samples_mv, dtype=np.uint8).reshape(
+            page_pix.height, page_pix.width, page_pix.n
+        )
+        x0, y0 = irect.x0 - page_pix.x, irect.y0 - page_pix.y
+        region = samples[y0:y0 + irect.height, x0:x0 + irect.width]
+        return float(region.var())
 
-    def _filter_images(self, chunk, page, pdf_name):
+    def _filter_images(self, chunk, render_page, page_num, pdf_name):
         """
         Filter all images in a chunk and delete rejected ones.
 
         Args:
             chunk: Page chunk dict from pymupdf4llm
-            page: PyMuPDF page object
+            render_page: Returns the full-page pixmap at table_dpi,
+                rendering it on first call
+            page_num: Page number (1-based)
             pdf_name: PDF filename without extension
 
         Returns:
-            Updated chunk with filtered images
+            Tuple (updated chunk with filtered images, number filtered out)
         """
-        filtered_images = []
-        page_index = chunk['metadata']['page'] - 1  # Convert to 0-based
+        images = chunk.get('images', [])
+        if not images:
+            return chunk, 0
+
+        page_index = page_num - 1  # Convert to 0-based
+        filtered_count = 0
+
+        # Geometry filters for all images at once
+        bboxes = np.array([image['bbox'] for image in images], dtype=np.float64)
+        width = bboxes[:, 2] - bboxes[:, 0]
+        height = bboxes[:, 3] - bboxes[:, 1]
+        area = width * height
+        aspect_ratio = np.divide(width, height, out=np.zeros_like(width), where=height > 0)
+
+        too_small = area < self.min_image_area
+        bad_aspect = (aspect_ratio < self.min_aspect_ratio) | (aspect_ratio > self.max_aspect_ratio)
+
+        # {pdf}-{page_index}-{n}.png, the names pymupdf4llm's images are renamed to
+        path_prefix = f"{self._charts_root}/{pdf_name}-{page_index}-"
 
-        for img_index, image in enumerate(chunk.get('images', [])):
-            bbox = image['bbox']
+        for img_index, image in enumerate(images):
+            variance = None
+
+            # Filter 1: Area check
+            if too_small[img_index]:
+                reason = "too small area"
+            # Filter 2: Aspect ratio check
+            elif bad_aspect[img_index]:
+                reason = f"bad aspect ratio ({aspect_ratio[img_index]:.2f})"
+            # Filter 3: Blank check, only for images that passed the cheap ones
+            else:
+                variance = self._pixel_variance(image['bbox'], render_page())
+                if variance < self.min_pixel_variance:
+                    reason = "low pixel variance (blank/low quality)"
+                else:
+                    reason = "passed"
 
-            # Apply filters
-            should_keep, reason, file_size_kb = self._filter_image(bbox, page)
+            should_keep = reason == "passed"
 
             # Build file path
-            file_path = f"{self.charts_dir}/{pdf_name}-{page_index}-{img_index}.png"
+            file_path = f"{path_prefix}{img_index}.png"
 
             # Add metadata
             image['filtered'] = not should_keep
             image['filter_reason'] = reason
             image['file_path'] = file_path
-            image['file_size_kb'] = round(file_size_kb, 1) if file_size_kb else None
+            image['pixel_variance'] = round(variance, 1) if variance is not None else None
 
             # Delete filtered images from disk
             if not should_keep:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+                filtered_count += 1
+                Path(file_path).unlink(missing_ok=True)
 
-            filtered_images.append(image)
+        return chunk, filtered_count
 
-        chunk['images'] = filtered_images
-        return chunk
-
-    def _extract_table_image(self, page, table_bbox, page_num, table_num, pdf_name):
+    def _extract_table_image(self, page_pix, table_bbox, image_path, pool):
         """
         Extract a single table region as image.
 
         Args:
-            page: PyMuPDF page object
+            page_pix: Full-page pixmap rendered at table_dpi
             table_bbox: Tuple (x0, y0, x1, y1) - table location
-            page_num: Page number (1-based)
-            table_num: Table index on page (1-based)
-            pdf_name: PDF filename without extension
+            image_path: Where to save the PNG
+            pool: Executor the PNG encode and write are submitted to
 
         Returns:
-            str: Path where image was saved
+            Future of the save
         """
         # Add padding to bbox
         bbox = pymupdf.Rect(table_bbox)
@@ -192,40 +328,141 @@ class PDFExtractor:
                               self.table_padding, self.table_padding)
 
         # Extract as image
-        pix = page.get_pixmap(clip=padded_bbox, dpi=self.table_dpi)
-
-        # Save with descriptive name
-        image_path = f"{self.tables_dir}/{pdf_name}_page{page_num}_table{table_num}.png"
-        pix.save(image_path)
+        pix = self._crop(page_pix, padded_bbox)
 
-        return image_path
+        # PIL gets its own copy of the pixels, so only PIL (which releases
+        # the GIL while encoding) runs on the pool — PyMuPDF objects stay on
+        # this thread.
+        image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        return pool.submit(image.save, image_path, compress_level=TABLE_PNG_COMPRESS_LEVEL)
 
-    def _extract_tables(self, chunk, page, pdf_name):
+    def _extract_tables(self, chunk, render_page, page_num, pdf_name):
         """
         Extract all tables from a chunk as images.
 
         Args:
             chunk: Page chunk dict from pymupdf4llm
-            page: PyMuPDF page object
+            render_page: Returns the full-page pixmap at table_dpi,
+                rendering it on first call
+            page_num: Page number (1-based)
             pdf_name: PDF filename without extension
 
         Returns:
-            Updated chunk with table image paths
+            Tuple (updated chunk with table image paths, number of tables)
         """
-        page_num = chunk['metadata']['page']
+        tables = chunk.get('tables', [])
 
-        for table_num, table in enumerate(chunk.get('tables', []), start=1):
-            bbox = table['bbox']
+        if not tables:
+            return chunk, 0
 
-            # Extract table as image
-            image_path = self._extract_table_image(
-                page, bbox, page_num, table_num, pdf_name
-            )
+        with ThreadPoolExecutor(max_workers=min(len(tables), SAVE_WORKERS)) as pool:
+            saves = []
+
+            # Saved with descriptive names: {pdf}_page{page_num}_table{n}.png
+            path_prefix = f"{self._tables_root}/{pdf_name}_page{page_num}_table"
 
-            # Add image path to metadata
-            table['image_path'] = image_path
+            for table_num, table in enumerate(tables, start=1):
+                bbox = table['bbox']
+                image_path = f"{path_prefix}{table_num}.png"
 
-        return chunk
+                # Extract table as image
+                saves.append(self._extract_table_image(render_page(), bbox, image_path, pool))
+
+                # Add image path to metadata
+                table['image_path'] = image_path
+
+            # All of this page's tables are on disk before it is reported done
+            for saved in saves:
+                saved.result()
+
+        return chunk, len(tables)
+
+    def _needs_layout(self, page):
+        """
+        True if the page has images or vector drawings, i.e. anything
+        pymupdf4llm's image/table extraction or the OCR check could act on.
+        """
+        return bool(page.get_images()) or bool(page.get_cdrawings())
+
+    def _extract_chunks(self, doc, image_dir, write_images=True):
+        """
+        Per-page chunks in pymupdf4llm's page_chunks format. With the
+        pypdfium2 backend, plain-text pages skip pymupdf4llm's layout
+        analysis and only carry metadata and raw, non-markdown text.
+
+        Args:
+            doc: PyMuPDF document
+            image_dir: Directory pymupdf4llm writes page images to
+            write_images: False to skip writing images (and drop their entries)
+
+        Returns:
+            list: One chunk dict per page, in page order
+        """
+        layout_pages = list(range(doc.page_count))
+        pdfium = None
+
+        if self.text_backend == "pypdfium2":
+            try:
+                import pypdfium2 as pdfium
+            except ImportError:
+                logger.warning("pypdfium2 not installed — using pymupdf4llm for all pages")
+            else:
+                layout_pages = [i for i in layout_pages if self._needs_layout(doc[i])]
+
+        chunks = [None] * doc.page_count
+
+        if layout_pages:
+            layout_chunks = pymupdf4llm.to_markdown(
+                doc,
+                pages=layout_pages,
+                page_chunks=True,
+                write_images=write_images,
+                image_path=image_dir,
+                image_size_limit=self.image_size_limit,
+                table_strategy=self.table_strategy,
+                use_ocr=False,  # Disable auto-OCR (we'll do manual Tesseract)
+                header=True,  # Keep headers (clean later)
+                footer=True  # Keep footers (clean later)
+            )
+            for chunk in layout_chunks:
+                # Vector paths, word boxes and image hashes are never read
+                # downstream but would be pickled to page workers and back,
+                # held until the end of extract() and serialized
+                for key in DROPPED_CHUNK_KEYS:
+                    chunk.pop(key, None)
+                for image in chunk.get('images', []):
+                    for key in DROPPED_IMAGE_KEYS:
+                        image.pop(key, None)
+                if not write_images:
+                    chunk['images'] = []
+                chunks[chunk['metadata']['page'] - 1] = chunk
+
+        text_pages = [i for i, chunk in enumerate(chunks) if chunk is None]
+
+        if text_pages:
+            logger.info(f"{len(text_pages)} plain-text pages read with pypdfium2")
+
+            metadata = {**doc.metadata, "file_path": doc.name, "page_count": doc.page_count}
+            pdf = pdfium.PdfDocument(doc.name)
+            try:
+                for i in text_pages:
+                    page = pdf[i]
+                    textpage = page.get_textpage()
+                    text = textpage.get_text_range().replace("\r\n", "\n")
+                    textpage.close()
+                    page.close()
+
+                    chunks[i] = {
+                        "metadata": {**metadata, "page": i + 1},
+                        "toc_items": [],
+                        "tables": [],
+                        "images": [],
+                        "text": text
+                    }
+            finally:
+                pdf.close()
+
+        return chunks
 
     def _should_ocr(self, page):
         """
@@ -259,12 +496,177 @@ class PDFExtractor:
 
         return ocr_text, None
 
-    def extract(self, pdf_path):
+    def _process_page(self, page, chunk, needs_ocr, pdf_name):
+        """
+        OCR a scanned page, or filter images and extract tables of a
+        digital one.
+
+        Args:
+            page: PyMuPDF page object
+            chunk: Page chunk dict from pymupdf4llm
+            needs_ocr: Result of the OCR pre-pass for this page
+            pdf_name: PDF filename without extension
+
+        Returns:
+            Tuple (chunk, ocr_applied: bool, images_filtered: int, tables_extracted: int)
+        """
+        page_num = page.number + 1
+
+        if needs_ocr:
+            # SCANNED PAGE - Apply OCR
+            logger.debug(f"Page {page_num}: Scanned - applying OCR...")
+
+            ocr_text, image_path = self._ocr_page(page, page_num, pdf_name)
+
+            # Replace text with OCR'd version
+            chunk['text'] = ocr_text
+            chunk['metadata']['ocr_applied'] = True
+            chunk['metadata']['ocr_method'] = 'tesseract'
+            chunk['metadata']['scanned_image'] = image_path
+
+            return chunk, True, 0, 0
+
+        # DIGITAL PAGE - Process normally
+        logger.debug(f"Page {page_num}: Digital - processing...")
+
+        chunk['metadata']['ocr_applied'] = False
+
+        # Render the page at most once, and only if an image passes the
+        # geometry filters or there is a table; both crop from that render
+        render_page = cache(lambda: page.get_pixmap(dpi=self.table_dpi))
+
+        # Filter images
+        chunk, filtered_count = self._filter_images(chunk, render_page, page_num, pdf_name)
+
+        # Extract table images
+        chunk, tables_count = self._extract_tables(chunk, render_page, page_num, pdf_name)
+
+        return chunk, False, filtered_count, tables_count
+
+    def _cache_key(self, pdf_path):
+        """BLAKE2b of the PDF's bytes plus every setting that shapes the output."""
+        with open(pdf_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            digest = hashlib.blake2b(mm, digest_size=16)
+        digest.update(
+            f"{self.min_image_area}:{self.min_pixel_variance}:{self.min_aspect_ratio}:"
+            f"{self.max_aspect_ratio}:{self.table_dpi}:{self.table_padding}:"
+            f"{self.ocr_dpi}:{self.image_size_limit}:{self.table_strategy}:"
+            f"{self.text_backend}".encode()
+        )
+        return digest.hexdigest()
+
+    def _cached_files_present(self, output):
+        """True if every chart and table image the cached output references is on disk."""
+        for chunk in output['pages']:
+            for table in chunk.get('tables', []):
+                if not os.path.exists(table['image_path']):
+                    return False
+            for image in chunk.get('images', []):
+                if not image.get('filtered') and not os.path.exists(image['file_path']):
+                    return False
+        return True
+
+    def _result(self, output, json_path, return_data):
+        """Summary returned by extract(), built from its JSON output."""
+        summary = output['extraction_summary']
+        result = {
+            "success": True,
+            "pdf_name": output['pdf_name'],
+            "total_pages": output['total_pages'],
+            "scanned_pages": summary['scanned_pages'],
+            "ocr_count": summary['ocr_count'],
+            "images_filtered": summary['images_filtered'],
+            "tables_extracted": summary['tables_extracted'],
+            "output_file": json_path
+        }
+        if return_data:
+            result["data"] = output
+        return result
+
+    def _detect_scanned(self, doc, pdf_path, pool, page_workers):
+        """
+        OCR decision for every page, in one pass before extraction.
+
+        Args:
+            doc: PyMuPDF document
+            pdf_path: Path to PDF file (reopened by page workers)
+            pool: Page worker pool, or None to run inline
+            page_workers: Number of workers in pool
+
+        Returns:
+            list: needs_ocr flag per page, in page order
+        """
+        if pool is None:
+            return [self._should_ocr(page)[0] for page in doc]
+
+        needs_ocr = [False] * doc.page_count
+        batches = _strided_batches(list(range(doc.page_count)), page_workers)
+
+        for batch, flags in zip(batches, pool.map(
+            _detect_scanned_pages,
+            [self] * len(batches),
+            [pdf_path] * len(batches),
+            batches
+        )):
+            for i, flag in zip(batch, flags):
+                needs_ocr[i] = flag
+
+        return needs_ocr
+
+    def _process_all(self, doc, pdf_path, pdf_name, chunks, needs_ocr, pool, page_workers):
+        """
+        Run _process_page over every page. Scanned and digital pages are
+        batched separately, scanned first, so the slow OCR batches start
+        before the quick digital ones rather than finishing last.
+
+        Returns:
+            list: _process_page results, in page order
+        """
+        total_pages = len(chunks)
+
+        if pool is None:
+            processed = []
+            for i, chunk in enumerate(chunks):
+                processed.append(self._process_page(doc[i], chunk, needs_ocr[i], pdf_name))
+                self._log_progress(i + 1, 1, total_pages)
+            return processed
+
+        scanned = [(i, chunk, True) for i, chunk in enumerate(chunks) if needs_ocr[i]]
+        digital = [(i, chunk, False) for i, chunk in enumerate(chunks) if not needs_ocr[i]]
+        batches = _strided_batches(scanned, page_workers) + _strided_batches(digital, page_workers)
+
+        processed = [None] * total_pages
+        done = 0
+        for batch, batch_results in zip(batches, pool.map(
+            _process_pages,
+            [self] * len(batches),
+            [pdf_path] * len(batches),
+            [pdf_name] * len(batches),
+            batches
+        )):
+            for (i, _, _), result in zip(batch, batch_results):
+                processed[i] = result
+            done += len(batch)
+            self._log_progress(done, len(batch), total_pages)
+
+        return processed
+
+    def _log_progress(self, done, just_done, total):
+        """One progress line per PROGRESS_EVERY pages instead of one per page."""
+        if done == total or done // PROGRESS_EVERY > (done - just_done) // PROGRESS_EVERY:
+            logger.info(f"Processed {done}/{total} pages")
+
+    def extract(self, pdf_path, return_data=False, force_refresh=False):
         """
         Main extraction method - orchestrates everything.
 
         Args:
             pdf_path: Path to PDF file
+            return_data: Also return the extracted JSON dict under "data",
+                so callers can skip re-reading the file (default: False)
+            force_refresh: Re-extract even if this exact PDF was already
+                extracted with the same settings (default: False)
 
         Returns:
             dict: Extraction result with metadata
@@ -273,78 +675,94 @@ class PDFExtractor:
         logger.info(f"Processing: {pdf_path}")
         logger.info("=" * 80)
 
+        pdf_name = self._get_pdf_name(pdf_path)
+        json_path = f"{self.output_dir}/{pdf_name}_data.json"
+
+        # Same bytes, same settings, same name (image files are named after it)
+        cache_path = self.cache_dir / f"{self._cache_key(pdf_path)}.json"
+        if not force_refresh and cache_path.exists():
+            output = orjson.loads(cache_path.read_bytes())
+            if output['pdf_name'] == pdf_name and self._cached_files_present(output):
+                shutil.copyfile(cache_path, json_path)
+                logger.info(f"Extraction cache hit: {cache_path.name}")
+                return self._result(output, json_path, return_data)
+
         # Open PDF with PyMuPDF
         doc = pymupdf.open(pdf_path)
-        pdf_name = self._get_pdf_name(pdf_path)
         total_pages = doc.page_count
-        # Extract with pymupdf4llm (Layout Mode)
-        logger.info("Step 1: Extracting text, images, and tables...")
-        chunks = pymupdf4llm.to_markdown(
-            doc,
-            page_chunks=True,
-            write_images=True,
-            image_path=self.charts_dir,
-            image_size_limit=self.image_size_limit,
-            table_strategy=self.table_strategy,
-            use_ocr=False,  # Disable auto-OCR (we'll do manual Tesseract)
-            header=True,  # Keep headers (clean later)
-            footer=True  # Keep footers (clean later)
-        )
-        # Step 1 - strip .pdf only from regular image files (not full page renders)
-        for f in Path(self.charts_dir).glob("*.pdf-*.png"):
-            if f.stem.endswith('-full'):  # skip full page renders
-                continue
-            new_name = f.name.replace('.pdf-', '-')
-            f.rename(f.parent / new_name)
 
+        # One worker pool for both page passes
+        page_workers = min(self.page_workers, total_pages)
+        pool = None
+        if page_workers > 1:
+            pool = ProcessPoolExecutor(max_workers=page_workers, initializer=_init_page_worker)
+
+        try:
+            return self._extract_open(doc, pdf_path, pdf_name, json_path, cache_path,
+                                      return_data, pool, page_workers)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def _extract_open(self, doc, pdf_path, pdf_name, json_path, cache_path,
+                      return_data, pool, page_workers):
+        """extract() from the opened document onwards."""
+        total_pages = doc.page_count
+
+        # Decide OCR for every page up front
+        logger.info("Step 0: Detecting scanned pages...")
+        needs_ocr = self._detect_scanned(doc, str(pdf_path), pool, page_workers)
+
+        # Mostly scanned PDFs keep only their OCR text (and tables), so their
+        # images are never written in the first place
+        images_removed = total_pages > 0 and (sum(needs_ocr) / total_pages) > 0.7
+        if images_removed:
+            logger.info("PDF detected as mostly scanned. Skipping image extraction...")
+
+        # Extract with pymupdf4llm (Layout Mode) / pypdfium2 for plain text
+        logger.info("Step 1: Extracting text, images, and tables...")
+        # pymupdf4llm writes into a folder of this PDF's own, so collecting its
+        # images lists only them rather than everything already in charts/
+        staging_dir = self.charts_dir / f".{pdf_name}"
+        staging_dir.mkdir(exist_ok=True)
+        chunks = self._extract_chunks(doc, staging_dir, write_images=not images_removed)
+
+        # Step 1 - move images into charts/, stripping .pdf only from regular
+        # image files (not full page renders)
+        charts_written = 0
+        with os.scandir(staging_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('-full.png'):  # keep full page renders as named
+                    os.replace(entry.path, self.charts_dir / entry.name)
+                    continue
+                os.replace(entry.path, self.charts_dir / entry.name.replace('.pdf-', '-'))
+                charts_written += 1
+        staging_dir.rmdir()
 
         logger.info(f"Extracted {len(chunks)} pages")
 
+        # Process each page
+        logger.info("Step 2: Processing pages...")
+
+        processed = self._process_all(doc, str(pdf_path), pdf_name, chunks, needs_ocr,
+                                      pool, page_workers)
+
         # Tracking variables
+        chunks = []
         ocr_count = 0
         scanned_pages = []
         images_filtered = 0
         tables_extracted = 0
-        # Process each page
-        logger.info("Step 2: Processing pages...")
 
-        for i, chunk in enumerate(chunks):
-            page = doc[i]
-            page_num = i + 1
-
-            # Check if needs OCR
-            needs_ocr, decision = self._should_ocr(page)
+        for page_num, (chunk, needs_ocr, filtered_count, tables_count) in enumerate(processed, start=1):
+            chunks.append(chunk)
 
             if needs_ocr:
-                # SCANNED PAGE - Apply OCR
-                logger.info(f"Page {page_num}: Scanned - applying OCR...")
-
-                ocr_text, image_path = self._ocr_page(page, page_num, pdf_name)
-
-                # Replace text with OCR'd version
-                chunk['text'] = ocr_text
-                chunk['metadata']['ocr_applied'] = True
-                chunk['metadata']['ocr_method'] = 'tesseract'
-                chunk['metadata']['scanned_image'] = image_path
-
-                # Track
                 ocr_count += 1
                 scanned_pages.append(page_num)
 
-            else:
-                # DIGITAL PAGE - Process normally
-                logger.info(f"Page {page_num}: Digital - processing...")
-
-                chunk['metadata']['ocr_applied'] = False
-
-                # Filter images
-                chunk = self._filter_images(chunk, page, pdf_name)
-                filtered_count = len([img for img in chunk.get('images', []) if img['filtered']])
-                images_filtered += filtered_count
-
-                # Extract table images
-                chunk = self._extract_tables(chunk, page, pdf_name)
-                tables_extracted += len(chunk.get('tables', []))
+            images_filtered += filtered_count
+            tables_extracted += tables_count
 
         logger.info("Processed all pages")
 
@@ -360,55 +778,39 @@ class PDFExtractor:
                 "scanned_pages": scanned_pages,
                 "ocr_count": ocr_count,
                 "images_filtered": images_filtered,
-                "tables_extracted": tables_extracted
+                "tables_extracted": tables_extracted,
+                "images_removed": images_removed
             },
             "pages": chunks
         }
 
         # Save JSON
-        json_path = f"{self.output_dir}/{pdf_name}_data.json"
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(output, f, indent=2, ensure_ascii=False, default=str)
+        # Compact UTF-8 bytes; str() covers anything orjson can't serialize.
+        # Serialized once — the cache entry below reuses the same bytes.
+        data = orjson.dumps(output, default=str)
+        Path(json_path).write_bytes(data)
 
         logger.info(f"Saved: {json_path}")
-        # ---------------------------------------------------------
-        # Remove images if PDF is mostly scanned
-        # ---------------------------------------------------------
-
-        if total_pages > 0 and (ocr_count / total_pages) > 0.7:
-            logger.info("PDF detected as mostly scanned. Removing extracted images...")
-
-            for f in Path(self.charts_dir).glob(f"{pdf_name}-*.png"):
-                try:
-                    f.unlink()
-                except Exception:
-                    pass
-
-            logger.info("Scanned PDF images removed.")
         # Print summary
         logger.info("=" * 80)
         logger.info("EXTRACTION COMPLETE")
         logger.info("=" * 80)
         logger.info(f"Output directory: {self.output_dir}")
         logger.info(f"Data file: {pdf_name}_data.json")
-        logger.info(f"Charts: {len(os.listdir(self.charts_dir))} files")
-        logger.info(f"Tables: {len(os.listdir(self.tables_dir))} files")
+        logger.info(f"Charts: {charts_written} files ({images_filtered} filtered out)")
+        logger.info(f"Tables: {tables_extracted} files")
         logger.info("=" * 80)
 
         # Close document
         doc.close()
 
+        # Cache entry written atomically so a concurrent ingest never reads half a file
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, cache_path)
+
         # Return summary
-        return {
-            "success": True,
-            "pdf_name": pdf_name,
-            "total_pages": total_pages,
-            "scanned_pages": scanned_pages,
-            "ocr_count": ocr_count,
-            "images_filtered": images_filtered,
-            "tables_extracted": tables_extracted,
-            "output_file": json_path
-        }
+        return self._result(output, json_path, return_data)
 
     def extract_multiple(self, pdf_paths):
         """
@@ -4,13 +4,59 @@ Cleans extracted PDF text using frequency-based pattern detection
 """
 
 import re
-import json
+import orjson
 from pathlib import Path
 from collections import Counter
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 import logging
 import os
 logger = logging.getLogger(__name__)
 
+# Line patterns, compiled once rather than looked up in re's cache per line
+# Image references and page numbers at the start of a line, as one alternation
+_LINE_START_RE = re.compile(
+    r'(?P<img>!\[\]\([^)]+\))|(?P<page>Page\s+\d+|\d+\s*\|)',
+    re.IGNORECASE
+)
+_IMG_REF_RE = re.compile(r'!\[\]\([^)]+\)')
+_TRAILING_PAGE_RE = re.compile(r'\s*Page\s+\d+\s+(of|/)\s+\d+\s*$', re.IGNORECASE)
+# Whitespace around a newline (str.strip's set, minus the newline itself)
+_LINE_EDGE_WS_RE = re.compile(r'[^\S\n]*\n[^\S\n]*')
+_BLANK_RUN_RE = re.compile(r'\n{4,}')
+_NUM_RE = re.compile(r'\d+[,.]?\d*')
+# Month names and quantity words, scanned in a single pass over lowercased text
+_KEEP_WORD_RE = re.compile(
+    r'\b(?:january|february|march|april|may|june|july|august|september|october|november|december)\b'
+    r'|percent|million|billion|trillion|total|average'
+)
+
+
+def _frequent_lines(counter, min_count):
+    """
+    Lines seen at least min_count times; most_common() is sorted, so the
+    scan stops at the first count below the bar
+    """
+    frequent = set()
+    for line, count in counter.most_common():
+        if count < min_count:
+            break
+        frequent.add(line)
+    return frequent
+
+
+def _clean_file(cleaner, json_path, output_path):
+    """
+    Clean one extracted JSON file; top-level so clean_multiple's worker
+    processes can unpickle it
+
+    Returns:
+        int: Number of pages cleaned
+    """
+    json_data = orjson.loads(json_path.read_bytes())
+    cleaned_data = cleaner.clean_document(json_data, output_path)
+    return len(cleaned_data['pages'])
+
 
 class TextCleaner:
     """
@@ -26,7 +72,7 @@ class TextCleaner:
     """
 
     def __init__(self, header_threshold=0.3, footer_threshold=0.3,
-                 global_threshold=0.35, max_line_length=80):
+                 global_threshold=0.35, max_line_length=80, preserve_original=False):
         """
         Initialize text cleaner
 
@@ -35,16 +81,20 @@ class TextCleaner:
             footer_threshold: Frequency threshold for footer detection (default: 0.3 = 30%)
             global_threshold: Frequency threshold for globally frequent lines (default: 0.2 = 20%)
             max_line_length: Maximum line length to consider for global analysis (default: 80)
+            preserve_original: Keep each page's raw text as 'text_original' (default: False)
         """
         self.project_root = Path(__file__).resolve().parents[2]
         self.header_threshold = header_threshold
         self.footer_threshold = footer_threshold
         self.global_threshold = global_threshold
         self.max_line_length = max_line_length
+        self.preserve_original = preserve_original
 
         self.detected_headers = set()
         self.detected_footers = set()
         self.globally_frequent_lines = set()
+        # line -> (is_header, is_footer, is_global), so cleaning probes once per line
+        self._drop_kinds = {}
 
     def analyze_document(self, json_data):
         """
@@ -76,7 +126,9 @@ class TextCleaner:
             if not text.strip():
                 continue
 
-            lines = [line.strip() for line in text.split('\n') if line.strip()]
+            # Kept on the page so clean_document doesn't split and strip again
+            page['_lines'] = [line.strip() for line in text.split('\n')]
+            lines = [line for line in page['_lines'] if line]
 
             if not lines:
                 continue
@@ -97,19 +149,22 @@ class TextCleaner:
         footer_min_count = int(total_pages * self.footer_threshold)
         global_min_count = int(total_pages * self.global_threshold)
 
-        self.detected_headers = {
-            line for line, count in first_lines_counter.items()
-            if count >= header_min_count
-        }
+        self.detected_headers = _frequent_lines(first_lines_counter, header_min_count)
+        self.detected_footers = _frequent_lines(last_lines_counter, footer_min_count)
 
-        self.detected_footers = {
-            line for line, count in last_lines_counter.items()
-            if count >= footer_min_count
+        # Keep-line checks only run on the few lines that cleared the bar
+        self.globally_frequent_lines = {
+            line for line in _frequent_lines(all_lines_counter, global_min_count)
+            if not self._should_keep_line(line)
         }
 
-        self.globally_frequent_lines = {
-            line for line, count in all_lines_counter.items()
-            if count >= global_min_count and not self._should_keep_line(line)
+        self._drop_kinds = {
+            line: (
+                line in self.detected_headers,
+                line in self.detected_footers,
+                line in self.globally_frequent_lines
+            )
+            for line in self.detected_headers | self.detected_footers | self.globally_frequent_lines
         }
 
         logger.info(f"Analyzed {total_pages} pages")
@@ -165,40 +220,31 @@ class TextCleaner:
             'global_counts': dict(all_lines_counter)
         }
 
-    def _is_page_number(self, line):
+    def _classify_line(self, line):
         """
-        Check if line is a page number
+        Classify a stripped line by its start, in one anchored match
 
         Args:
-            line: Text line to check
+            line: Stripped text line to check
 
         Returns:
-            bool: True if line looks like a page number
+            str | None: 'img' for a markdown image reference, 'page' for a
+                page number ("12", "Page 12", "12 | ..."), else None
         """
-        line = line.strip()
+        # A line that was only "Page N of M" is empty after the trailing-page strip
+        if not line:
+            return None
 
-        if line.isdigit():
-            return True
+        # Every pattern starts with '!', 'P'/'p' or a digit; most lines don't
+        first = line[0]
+        if first != '!' and first not in 'Pp' and not first.isdigit():
+            return None
 
-        if re.match(r'^Page\s+\d+', line, re.IGNORECASE):
-            return True
-
-        if re.match(r'^\d+\s*\|', line):
-            return True
-
-        return False
-
-    def _is_image_reference(self, line):
-        """
-        Check if line is a markdown image reference
-
-        Args:
-            line: Text line to check
+        if line.isdigit():
+            return 'page'
 
-        Returns:
-            bool: True if line is an image reference
-        """
-        return bool(re.match(r'^!\[\]\([^)]+\)', line.strip()))
+        m = _LINE_START_RE.match(line)
+        return m.lastgroup if m else None
 
     def _remove_image_references(self, text):
         """
@@ -210,12 +256,17 @@ class TextCleaner:
         Returns:
             str: Text with image references removed
         """
-        return re.sub(r'!\[\]\([^)]+\)', '', text)
+        if '![' not in text:
+            return text
+        return _IMG_REF_RE.sub('', text)
 
-    def _should_keep_line(self, line):
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _should_keep_line(line):
         """
         Check if line should be kept even if frequent
         Protects important repeated content like data/dates
+        (cached, since boilerplate lines repeat across documents)
 
         Args:
             line: Text line to check
@@ -225,22 +276,14 @@ class TextCleaner:
         """
         line = line.strip()
 
-        if re.search(r'\d+[,.]?\d*', line):
-            return True
-
-        if re.search(r'\b(January|February|March|April|May|June|July|August|September|October|November|December)\b', line, re.IGNORECASE):
-            return True
-
-        if re.search(r'\d{4}', line):
+        # Also covers years: any 4-digit run already matches here
+        if _NUM_RE.search(line):
             return True
 
         if '.' in line and not line.endswith('...'):
             return True
 
-        if any(word in line.lower() for word in ['percent', 'million', 'billion', 'trillion', 'total', 'average']):
-            return True
-
-        return False
+        return _KEEP_WORD_RE.search(line.lower()) is not None
 
     def _normalize_whitespace(self, text):
         """
@@ -252,35 +295,63 @@ class TextCleaner:
         Returns:
             str: Normalized text
         """
-        lines = text.split('\n')
-        lines = [line.strip() for line in lines]
+        # Strip every line, then keep at most two blank lines in a row
+        text = _LINE_EDGE_WS_RE.sub('\n', text).strip()
+        return _BLANK_RUN_RE.sub('\n\n\n', text)
+
+    def _clean_line(self, line, at_head=False, at_tail=False):
+        """
+        Apply the line-level rules to one stripped line
+
+        Args:
+            line: Stripped text line
+            at_head: Line is among the page's first 3 lines
+            at_tail: Line is among the page's last 3 lines
+
+        Returns:
+            str | None: Line to keep (possibly shortened), or None to drop it
+        """
+        if not line:
+            return line
+        # ---------------------------------------------------------
+        # Remove trailing page number patterns like:
+        # "Page 10 of 52" at end of header/footer line (SAFE)
+        # ---------------------------------------------------------
+        # (the pattern ends in a digit, so only such lines can match)
+        if line[-1].isdigit():
+            line = _TRAILING_PAGE_RE.sub('', line).strip()
+
+        drop_kinds = self._drop_kinds.get(line)
+        if drop_kinds is not None:
+            is_header, is_footer, is_global = drop_kinds
+
+            if at_head and is_header:
+                return None
+
+            if at_tail and is_footer:
+                return None
+
+            if is_global:
+                return None
 
-        cleaned = []
-        blank_count = 0
+        kind = self._classify_line(line)
 
-        for line in lines:
-            if line == '':
-                blank_count += 1
-                if blank_count <= 2:
-                    cleaned.append(line)
-            else:
-                cleaned.append(line)
-                blank_count = 0
+        if kind == 'page' and (at_head or at_tail):
+            return None
 
-        while cleaned and cleaned[0] == '':
-            cleaned.pop(0)
-        while cleaned and cleaned[-1] == '':
-            cleaned.pop()
+        if kind == 'img':
+            return None
 
-        return '\n'.join(cleaned)
+        return line
 
-    def clean_page_text(self, text, page_num=None):
+    def clean_page_text(self, text, page_num=None, lines=None):
         """
         Clean text from a single page
 
         Args:
             text: Raw text from page
             page_num: Page number (for logging)
+            lines: Optional stripped lines of text, as saved by analyze_document
 
         Returns:
             str: Cleaned text
@@ -288,40 +359,34 @@ class TextCleaner:
         if not text or not text.strip():
             return ""
 
-        lines = [line.strip() for line in text.split('\n')]
+        if lines is None:
+            lines = [line.strip() for line in text.split('\n')]
 
-        cleaned_lines = []
-
-        for i, line in enumerate(lines):
-            if not line:
-                cleaned_lines.append(line)
-                continue
-            # ---------------------------------------------------------
-            # Remove trailing page number patterns like:
-            # "Page 10 of 52" at end of header/footer line (SAFE)
-            # ---------------------------------------------------------
-            line = re.sub(r'\s*Page\s+\d+\s+(of|/)\s+\d+\s*$',
-                '',
-                line,
-                flags=re.IGNORECASE
-            ).strip()
-
-            if i < 3 and line in self.detected_headers:
-                continue
+        # Header rules only apply to the first 3 lines and footer rules to the
+        # last 3, so the body is cleaned without any position checks
+        n = len(lines)
+        head_end = min(3, n)
+        tail_start = max(head_end, n - 3)
 
-            if i >= len(lines) - 3 and line in self.detected_footers:
-                continue
-
-            if line in self.globally_frequent_lines:
-                continue
+        # Hoist the attribute lookups out of the per-line loops
+        clean_line = self._clean_line
+        cleaned_lines = []
+        keep = cleaned_lines.append
 
-            if (i < 3 or i >= len(lines) - 3) and self._is_page_number(line):
-                continue
+        for i, line in enumerate(lines[:head_end]):
+            line = clean_line(line, True, i >= n - 3)
+            if line is not None:
+                keep(line)
 
-            if self._is_image_reference(line):
-                continue
+        for line in lines[head_end:tail_start]:
+            line = clean_line(line)
+            if line is not None:
+                keep(line)
 
-            cleaned_lines.append(line)
+        for line in lines[tail_start:]:
+            line = clean_line(line, False, True)
+            if line is not None:
+                keep(line)
 
         cleaned_text = '\n'.join(cleaned_lines)
         cleaned_text = self._remove_image_references(cleaned_text)
@@ -352,14 +417,16 @@ class TextCleaner:
         for page in json_data.get('pages', []):
             page_num = page.get('metadata', {}).get('page', '?')
             original_text = page.get('text', '')
+            lines = page.pop('_lines', None)
 
-            cleaned_text = self.clean_page_text(original_text, page_num)
+            cleaned_text = self.clean_page_text(original_text, page_num, lines)
 
             cleaned_page = {
                 **page,
-                'text': cleaned_text,
-                'text_original': original_text
+                'text': cleaned_text
             }
+            if self.preserve_original:
+                cleaned_page['text_original'] = original_text
 
             cleaned_pages.append(cleaned_page)
 
@@ -373,7 +440,8 @@ class TextCleaner:
                 'globally_frequent': list(self.globally_frequent_lines),
                 'header_threshold': self.header_threshold,
                 'footer_threshold': self.footer_threshold,
-                'global_threshold': self.global_threshold
+                'global_threshold': self.global_threshold,
+                'preserve_original': self.preserve_original
             }
         }
 
@@ -381,8 +449,7 @@ class TextCleaner:
             output_path = Path(output_path)
             output_path.parent.mkdir(parents=True, exist_ok=True)
 
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(cleaned_json, f, indent=2, default=str)
+            output_path.write_bytes(orjson.dumps(cleaned_json, default=str))
 
             logger.info(f"Saved cleaned JSON: {output_path}")
 
@@ -404,35 +471,55 @@ class TextCleaner:
         output_dir = self.project_root / output_dir
         output_dir.mkdir(parents=True, exist_ok=True)
 
+        json_paths = [Path(json_file) for json_file in json_files]
         results = {}
 
-        for json_file in json_files:
-            json_path = Path(json_file)
-
-            logger.info("=" * 80)
-            logger.info(f"Processing: {json_path.name}")
-            logger.info("=" * 80)
+        # Bound the keep-line cache to one run
+        TextCleaner._should_keep_line.cache_clear()
 
-            try:
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    json_data = json.load(f)
+        # Files are independent, so clean them in separate processes. Pages
+        # within a file stay serial: each one is far cheaper than pickling it.
+        workers = min(len(json_paths), os.cpu_count() or 1)
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
 
+        try:
+            futures = []
+            for json_path in json_paths:
                 output_path = output_dir / f"{json_path.stem}_cleaned.json"
-
-                cleaned_data = self.clean_document(json_data, output_path)
-
-                results[str(json_path)] = {
-                    'success': True,
-                    'output_path': str(output_path),
-                    'pages_cleaned': len(cleaned_data['pages'])
-                }
-
-            except Exception as e:
-                logger.error(f"Error processing {json_path.name}: {e}")
-                results[str(json_path)] = {
-                    'success': False,
-                    'error': str(e)
-                }
+                if pool is None:
+                    futures.append((json_path, output_path, None))
+                else:
+                    futures.append((
+                        json_path, output_path,
+                        pool.submit(_clean_file, self, json_path, output_path)
+                    ))
+
+            for json_path, output_path, future in futures:
+                logger.info("=" * 80)
+                logger.info(f"Processing: {json_path.name}")
+                logger.info("=" * 80)
+
+                try:
+                    if future is None:
+                        pages_cleaned = _clean_file(self, json_path, output_path)
+                    else:
+                        pages_cleaned = future.result()
+
+                    results[str(json_path)] = {
+                        'success': True,
+                        'output_path': str(output_path),
+                        'pages_cleaned': pages_cleaned
+                    }
+
+                except Exception as e:
+                    logger.error(f"Error processing {json_path.name}: {e}")
+                    results[str(json_path)] = {
+                        'success': False,
+                        'error': str(e)
+                    }
+        finally:
+            if pool is not None:
+                pool.shutdown()
 
         return results
 
@@ -457,8 +544,7 @@ if __name__ == "__main__":
     if not TEST_JSON.exists():
         logger.error(f"JSON file not found: {TEST_JSON}")
     else:
-        with open(TEST_JSON, 'r', encoding='utf-8') as f:
-            json_data = json.load(f)
+        json_data = orjson.loads(TEST_JSON.read_bytes())
 
         # ✅ Absolute path to project-level cleaned directory
         output_path = project_root / "cleaned" / f"{TEST_JSON.stem}_cleaned.json"
@@ -0,0 +1,64 @@
+"""
+Vision Cache - FinReg Navigator
+Persists image descriptions keyed by resized image bytes, prompt and model,
+so re-ingesting unchanged images skips the Vision API call
+"""
+
+import hashlib
+import sqlite3
+import threading
+import logging
+from pathlib import Path
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class VisionCache:
+    """
+    SQLite-backed description cache. One connection is shared by the
+    describer's threads behind a lock; WAL mode lets ingestion worker
+    processes read and write the same file concurrently.
+    """
+
+    def __init__(self, db_path):
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS descriptions ("
+            "key TEXT PRIMARY KEY, description TEXT, created_at TEXT)"
+        )
+        self._conn.commit()
+
+        logger.info(f"[VisionCache] Using {db_path}")
+
+    @staticmethod
+    def make_key(image_bytes: bytes, prompt: str, model: str) -> str:
+        return ":".join([
+            hashlib.sha256(image_bytes).hexdigest(),
+            hashlib.blake2b(prompt.encode(), digest_size=8).hexdigest(),
+            model,
+        ])
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT description FROM descriptions WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, description: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO descriptions VALUES (?, ?, ?)",
+                (key, description, datetime.now().isoformat())
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -5,12 +5,27 @@ logger = logging.getLogger(__name__)
 
 
 class OllamaClient:
-    def __init__(self, model: str = "llama3:8b", temperature: float = 0.2):
+    def __init__(self, model: str = "llama3:8b", temperature: float = 0.2,
+                 host: str | None = None):
         self.model = model
         self.temperature = temperature
+        # Own client (host=None falls back to OLLAMA_HOST) keeps one connection pool
+        self.client = ollama.Client(host=host)
+        self._options = {"temperature": self.temperature}
 
         logger.info(f"Ollama client initialized with model: {self.model}")
 
+    def warmup(self):
+        """
+        Load the model into Ollama's memory without generating anything
+        (an empty message list only triggers the load).
+        """
+        try:
+            self.client.chat(model=self.model, messages=[])
+            logger.info(f"Ollama model warmed up: {self.model}")
+        except Exception as e:
+            logger.warning(f"Ollama warmup failed: {e}")
+
     def chat(self, messages: list):
         """
         messages format:
@@ -21,16 +36,37 @@ class OllamaClient:
         """
 
         try:
-            response = ollama.chat(
+            response = self.client.chat(
                 model=self.model,
                 messages=messages,
-                options={
-                    "temperature": self.temperature
-                }
+                options=self._options
             )
 
             return response["message"]["content"]
 
         except Exception as e:
             logger.error(f"Ollama error: {e}")
-            return "LLM_ERROR"
\ No newline at end of file
+            return "LLM_ERROR"
+
+    def chat_stream(self, messages: list):
+        """
+        Same as chat(), but yields the response content piece by piece
+        as Ollama generates it.
+        """
+
+        try:
+            stream = self.client.chat(
+                model=self.model,
+                messages=messages,
+                options=self._options,
+                stream=True
+            )
+
+            for part in stream:
+                piece = part["message"]["content"]
+                if piece:
+                    yield piece
+
+        except Exception as e:
+            logger.error(f"Ollama error: {e}")
+            yield "LLM_ERROR"
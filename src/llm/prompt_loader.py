@@ -0,0 +1,36 @@
+import logging
+from functools import lru_cache
+from pathlib import Path
+
+import yaml
+
+try:
+    # LibYAML bindings — much faster than the pure-Python loader
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_PROMPTS_PATH = PROJECT_ROOT / "prompts" / "prompts.yaml"
+
+
+def load_prompts(prompts_path=None) -> dict:
+    """
+    Load prompts.yaml once per process.
+
+    Relative paths resolve against the project root. The returned dict is
+    shared between callers — treat it as read-only.
+    """
+    path = Path(prompts_path) if prompts_path else DEFAULT_PROMPTS_PATH
+    if not path.is_absolute():
+        path = PROJECT_ROOT / path
+    return _load_prompts(path.resolve())
+
+
+@lru_cache(maxsize=None)
+def _load_prompts(path: Path) -> dict:
+    logger.info(f"Loading prompts: {path}")
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=_SafeLoader)
@@ -1,5 +1,6 @@
 import logging
-from sentence_transformers import SentenceTransformer
+
+from src.ingest.embed import load_embedding_model
 
 
 logger = logging.getLogger(__name__)
@@ -13,12 +14,21 @@ class QueryEmbedder:
 
     def __init__(
         self,
-        model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        fp16: bool = False
     ):
         self.model_name = model_name
 
         logger.info(f"Loading embedding model: {self.model_name}")
-        self.model = SentenceTransformer(self.model_name)
+        # Same cached instance Embedder and Retriever use (fp16 only applies on CUDA)
+        self.model = load_embedding_model(self.model_name, fp16=fp16)
+        # encode() already runs under torch.inference_mode
+        self._encode_kwargs = dict(
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
         logger.info("Embedding model loaded successfully.")
 
     # -------------------------------------------------------
@@ -33,7 +43,7 @@ class QueryEmbedder:
         if not isinstance(query, str) or not query.strip():
             raise ValueError("Query must be a non-empty string.")
 
-        return self.model.encode(query)
+        return self.model.encode([query], **self._encode_kwargs)[0]
 
     # -------------------------------------------------------
     # Batch Embedding (Future Use)
@@ -47,4 +57,4 @@ class QueryEmbedder:
         if not isinstance(queries, list) or not queries:
             raise ValueError("Queries must be a non-empty list of strings.")
 
-        return self.model.encode(queries)
\ No newline at end of file
+        return self.model.encode(queries, **self._encode_kwargs)
\ No newline at end of file
@@ -1,13 +1,19 @@
 import chromadb
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
 import logging
 
+from src.ingest.embed import load_embedding_model
+
 logger = logging.getLogger(__name__)
 
 
 class Retriever:
 
+    # Max distance for a hit to count as relevant
+    SIMILARITY_THRESHOLD = 0.7
+
     def __init__(
         self,
         mode="regulatory_only",
@@ -25,7 +31,15 @@ class Retriever:
         logger.info(f"Connecting to Chroma at: {self.persist_dir}")
         self.client = chromadb.PersistentClient(path=str(self.persist_dir))
 
-        self.embedder = SentenceTransformer(embedding_model)
+        # Same cached instance the ingestion Embedder uses
+        self.embedder = load_embedding_model(embedding_model)
+        # One query per call: skip the progress bar and hand Chroma a numpy row
+        self._encode_kwargs = dict(
+            batch_size=1,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
 
         self.text_collections = []
         self.image_collections = []
@@ -76,15 +90,18 @@ class Retriever:
         text_name = f"finreg_uploaded_text_{upload_id}"
         image_name = f"finreg_uploaded_image_{upload_id}"
 
+        # Uploads are embedded into the in-memory client (see Embedder)
+        upload_client = chromadb.EphemeralClient()
+
         try:
-            up_text = self.client.get_collection(text_name)
+            up_text = upload_client.get_collection(text_name)
             self.text_collections.append(("uploaded", up_text))
             logger.info(f"Loaded uploaded text collection: {text_name}")
         except Exception:
             logger.warning(f"Uploaded text collection not found: {text_name}")
 
         try:
-            up_image = self.client.get_collection(image_name)
+            up_image = upload_client.get_collection(image_name)
             self.image_collections.append(("uploaded", up_image))
             logger.info(f"Loaded uploaded image collection: {image_name}")
         except Exception:
@@ -104,19 +121,15 @@ class Retriever:
         docs = results.get("documents", [[]])[0]
         metas = results.get("metadatas", [[]])[0]
         distances = results.get("distances", [[]])[0]
-        logger.info(f"[Retriever] Distances returned: {distances}")
-        SIMILARITY_THRESHOLD = 0.7
-        filtered = []
+        logger.debug("[Retriever] Distances returned: %s", distances)
 
-        for d, m, dist in zip(docs, metas, distances):
-            if dist <= SIMILARITY_THRESHOLD:
-                filtered.append({
-                    "text": d,
-                    "metadata": m,
-                    "distance": dist
-                })
+        dists = np.asarray(distances, dtype=np.float64)
+        keep = np.flatnonzero(dists <= self.SIMILARITY_THRESHOLD)
 
-        return filtered
+        return [
+            {"text": docs[i], "metadata": metas[i], "distance": float(dists[i])}
+            for i in keep
+        ]
 
     # --------------------------------------------
     # Public Search
@@ -126,7 +139,7 @@ class Retriever:
         k = 5 if self.mode == "compare" else 3
 
         logger.info(f"[Retriever] Query (k={k}): '{query[:80]}'")
-        query_embedding = self.embedder.encode(query)
+        query_embedding = self.embedder.encode([query], **self._encode_kwargs)[0]
 
         output = {
             "uploaded_text":    [],
@@ -135,18 +148,30 @@ class Retriever:
             "regulatory_images":[],
         }
 
-        for label, col in self.text_collections:
-            hits = self._search(col, query_embedding, k)
-            key  = "uploaded_text" if label == "uploaded" else "regulatory_text"
-            output[key].extend(hits)
-            logger.info(f"[Retriever] {key}: {len(hits)} hit(s) from '{col.name}'")
-
-        for label, col in self.image_collections:
-            hits = self._search(col, query_embedding, k)
-            key  = "uploaded_images" if label == "uploaded" else "regulatory_images"
-            output[key].extend(hits)
-            logger.info(f"[Retriever] {key}: {len(hits)} hit(s) from '{col.name}'")
-
-        total = sum(len(v) for v in output.values())
-        logger.info(f"[Retriever] Total hits: {total}")
+        targets = [
+            ("uploaded_text" if label == "uploaded" else "regulatory_text", col)
+            for label, col in self.text_collections
+        ] + [
+            ("uploaded_images" if label == "uploaded" else "regulatory_images", col)
+            for label, col in self.image_collections
+        ]
+
+        # Chroma releases the GIL while querying, so collections search in parallel;
+        # map() keeps results in collection order
+        if targets:
+            with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+                results = pool.map(
+                    lambda target: self._search(target[1], query_embedding, k), targets
+                )
+                debug = logger.isEnabledFor(logging.DEBUG)
+                for (key, col), hits in zip(targets, results):
+                    output[key].extend(hits)
+                    if debug:
+                        logger.debug("[Retriever] %s: %d hit(s) from '%s'", key, len(hits), col.name)
+
+        logger.info(
+            "[Retriever] Hits: uploaded_text=%d regulatory_text=%d "
+            "uploaded_images=%d regulatory_images=%d",
+            *map(len, output.values())
+        )
         return output
\ No newline at end of file
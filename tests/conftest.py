@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Modules import each other as src.*, as when run from the project root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,53 @@
+"""
+FastRecursiveSplitter must produce exactly the chunks of LangChain's
+RecursiveCharacterTextSplitter, with offsets that slice back to them.
+"""
+
+import random
+
+import pytest
+
+pytest.importorskip("langchain_text_splitters")
+pytest.importorskip("orjson")
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.ingest.document_chunker import FastRecursiveSplitter
+
+SEPARATORS = ["\n\n", "\n", ". ", " "]
+
+# Weighted so documents get paragraphs, short lines, sentences and long runs
+_TOKENS = ["\n\n"] * 2 + ["\n"] * 4 + [". "] * 6 + [" "] * 30 + ["\n\n\n", "  ", " \n"]
+
+
+def _random_document(rng):
+    parts = []
+    for _ in range(rng.randint(0, 400)):
+        word_len = rng.choice([rng.randint(1, 12)] * 20 + [rng.randint(100, 1500)])
+        parts.append("".join(rng.choices("abcdefghij", k=word_len)))
+        parts.append(rng.choice(_TOKENS))
+    return "".join(parts)
+
+
+def _splitters(**kwargs):
+    settings = {"chunk_size": 800, "chunk_overlap": 200, "separators": SEPARATORS, **kwargs}
+    return FastRecursiveSplitter(**settings), RecursiveCharacterTextSplitter(**settings)
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"keep_separator": "end"}, {"chunk_size": 120, "chunk_overlap": 30}])
+def test_matches_langchain_on_random_documents(kwargs):
+    fast, reference = _splitters(**kwargs)
+    rng = random.Random(0)
+
+    for _ in range(200):
+        text = _random_document(rng)
+        spans = fast.split_spans(text)
+        assert [text[start:end] for start, end in spans] == reference.split_text(text)
+
+
+def test_text_without_separators_stays_one_chunk():
+    fast, reference = _splitters()
+    text = "x" * 2000
+
+    assert fast.split_spans(text) == [(0, 2000)]
+    assert fast.split_text(text) == reference.split_text(text)
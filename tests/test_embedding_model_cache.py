@@ -0,0 +1,79 @@
+"""
+Embedder, Retriever and QueryEmbedder must share one SentenceTransformer per
+configuration, however each of them calls load_embedding_model.
+"""
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("chromadb")
+
+from src.ingest import embed
+from src.rag import query_embedder, retriever
+
+
+class _FakeModel:
+    device = type("Device", (), {"type": "cpu"})()
+
+
+class _FakeCollection:
+    def count(self):
+        return 0
+
+
+class _FakeClient:
+    def get_or_create_collection(self, name):
+        return _FakeCollection()
+
+    def get_collection(self, name):
+        raise ValueError(name)
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    calls = []
+
+    def fake_sentence_transformer(model_name, **kwargs):
+        calls.append(model_name)
+        return _FakeModel()
+
+    monkeypatch.setattr(embed, "SentenceTransformer", fake_sentence_transformer)
+    monkeypatch.setattr(retriever.chromadb, "PersistentClient", lambda path: _FakeClient())
+    embed._load_embedding_model.cache_clear()
+    yield calls
+    embed._load_embedding_model.cache_clear()
+
+
+def test_call_styles_share_one_cache_entry(loads):
+    a = embed.load_embedding_model("m")
+    b = embed.load_embedding_model("m", fp16=False, quantize=False, compile_model=False)
+    c = embed.load_embedding_model("m", fp16=False)
+
+    assert a is b is c
+    assert loads == ["m"]
+
+
+def test_embedder_retriever_query_embedder_share_model(loads):
+    name = "sentence-transformers/all-MiniLM-L6-v2"
+
+    embedder = embed.Embedder(mode="regulatory", client=_FakeClient(), embedding_model=name)
+    ret = retriever.Retriever(mode="regulatory_only", embedding_model=name)
+    queries = query_embedder.QueryEmbedder(model_name=name)
+
+    assert embedder.embedder is ret.embedder is queries.model
+    assert loads == [name]
+
+
+def test_distinct_configs_get_distinct_models(loads):
+    assert embed.load_embedding_model("m") is not embed.load_embedding_model("m", quantize=True)
+
+
+def test_query_embedder_fp16_flag_shares_default_model(loads):
+    # QueryEmbedder always passes fp16= by keyword; False must not be a new entry
+    name = "sentence-transformers/all-MiniLM-L6-v2"
+
+    ret = retriever.Retriever(mode="regulatory_only", embedding_model=name)
+    queries = query_embedder.QueryEmbedder(model_name=name, fp16=False)
+
+    assert queries.model is ret.embedder
+    assert loads == [name]